@@ -1,9 +1,22 @@
-import streamlit.components.v1 as components
 from pathlib import Path
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import bisect
+import functools
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
 import streamlit as st
-import pandas as pd
-import altair as alt
-from PIL import Image
+
+# pandas/numpy are imported after the page skeleton is drawn (see TITLE);
+# altair and PIL are imported lazily, where charts / icon thumbnails are built
 
 # -----------------------------------------------------------
 # STREAMLIT CONFIG (must be before any other st.* output)
@@ -11,6 +24,47 @@ from PIL import Image
 st.set_page_config(layout="wide")
 st.set_option("client.toolbarMode", "minimal")
 
+# -----------------------------------------------------------
+# STAGE TIMINGS (hidden debug panel, enabled with ?debug=1)
+# lap(name) attributes the time since the previous lap to `name`
+# -----------------------------------------------------------
+DEBUG_TIMINGS = st.query_params.get("debug", "").lower() in ("1", "true", "yes")
+STAGE_HISTORY_LEN = 200
+
+stage_timings = {}
+_stage_clock = [time.perf_counter()]
+FULL_RUN = True     # cleared at the end of the script: fragment reruns see False
+
+def lap(stage: str):
+    now = time.perf_counter()
+    stage_timings[stage] = stage_timings.get(stage, 0.0) + (now - _stage_clock[0])
+    _stage_clock[0] = now
+
+# -----------------------------------------------------------
+# PARTIAL RERUNS (fragments)
+# the sidebar, the filter state and the results table run with the whole
+# script; the downloads, the panels below the table and the batched advanced
+# options are fragments, so their own widgets rerun only their body
+# -----------------------------------------------------------
+def partial_rerun(func):
+    """st.fragment that keeps the debug timings, the URL and the Reset button in sync when it reruns alone."""
+    @functools.wraps(func)
+    def body():
+        solo = not FULL_RUN
+        if solo:
+            stage_timings.clear()
+            _stage_clock[0] = time.perf_counter()
+        func()
+        if solo:
+            lap(f"fragment:{func.__name__}")
+            if DEBUG_TIMINGS:
+                record_stage_history(n_filtered)
+            sync_query_params()
+            # a fragment widget in FILTER_KEYS (a plot toggle, ...) can show or hide the sidebar's Reset
+            if any_filter_active() != RESET_SHOWN:
+                st.rerun()
+    return st.fragment(body)
+
 # -----------------------------------------------------------
 # GLOBAL THEME + RESPONSIVE CSS (LIGHT/DARK + BREAKPOINTS)
 # -2px everywhere (outside + inside table)
@@ -371,45 +425,157 @@ st.markdown(
 )
 
 # -----------------------------------------------------------
-# Load data
+# TITLE (drawn before the data is loaded: first paint needs no data)
 # -----------------------------------------------------------
-@st.cache_data
-def load_data():
-    return pd.read_csv("sfile2_NEW_plusFam.csv")
+st.title("miR-RF Browser")
+st.markdown(
+    "Interactively explore and filter pre-miRNA annotations by species conservation, tissue expression, repeat classification and family context."
+)
+st.sidebar.header("Filters")
+
+import pandas as pd  # noqa: E402  (deferred until after first paint)
+import numpy as np   # noqa: E402
 
-df = load_data()
+lap("page")
+
+# -----------------------------------------------------------
+# Load data
+# -----------------------------------------------------------
+# MIRRF_DATA points the app at another annotation table (e.g. benchmark data);
+# further releases are the *.csv tables in MIRRF_RELEASES (default: releases/)
+DEFAULT_DATA_FILE = os.environ.get("MIRRF_DATA", "sfile2_NEW_plusFam.csv")
+RELEASE_DIR = os.environ.get("MIRRF_RELEASES", "releases")
+
+# every per-release cache below keeps at most this many releases (least recently used evicted)
+RELEASE_CACHE_SIZE = int(os.environ.get("MIRRF_RELEASE_CACHE", "3"))
+
+def list_releases():
+    """Release name -> table path: the default table, then every *.csv in RELEASE_DIR."""
+    releases = {Path(DEFAULT_DATA_FILE).stem: DEFAULT_DATA_FILE}
+    if os.path.isdir(RELEASE_DIR):
+        for path in sorted(Path(RELEASE_DIR).glob("*.csv")):
+            releases.setdefault(path.stem, str(path))
+    return releases
+
+RELEASES = list_releases()
+if len(RELEASES) > 1:
+    if "release" not in st.session_state and st.query_params.get("release") in RELEASES:
+        st.session_state["release"] = st.query_params["release"]
+    release = st.sidebar.selectbox("Release:", list(RELEASES), index=0, key="release")
+else:
+    release = next(iter(RELEASES))
+DATA_FILE = RELEASES[release]
+
+# Large-dataset mode (see COLUMN STORE): MIRRF_LARGE=1/0 forces it on/off,
+# otherwise it is used for tables of LARGE_TABLE_BYTES or more
+LARGE_TABLE_BYTES = 256 * 1024 * 1024
+PAGE_SIZE = 500
+COLUMN_STORE_DIR = os.environ.get("MIRRF_STORE_DIR")    # default: next to the table
+
+_large_env = os.environ.get("MIRRF_LARGE", "").strip().lower()
+if _large_env:
+    LARGE_MODE = _large_env in ("1", "true", "yes")
+else:
+    LARGE_MODE = os.path.getsize(DATA_FILE) >= LARGE_TABLE_BYTES
 
 # -----------------------------------------------------------
-# LOAD ICONS (same folder as this script)
+# ICONS (pre-resized thumbnails served as static assets)
+# thumbnails live in static/icons and are served by Streamlit's static
+# file server, so the browser caches them and reruns send no image bytes
 # -----------------------------------------------------------
+ICON_DISPLAY_WIDTH = 110
+ICON_PIXEL_WIDTH = 2 * ICON_DISPLAY_WIDTH   # 2x for high-density screens
+
+SYSTEM_ICON_FILES = {
+    "1. Cardiorespiratory system": "cardio.png",
+    "2. Digestive & Metabolic system": "gastro.png",
+    "3. Neuro-Endocrine system": "neuro.png",
+    "4. Immune / Hematolymphoid system": "immune.png",
+    "5. Musculoskeletal & Integumentary system": "muscle.png",
+    "6. Urogenital & Reproductive system": "reproductive.png",
+    "Others system": "other.png",
+}
+
+# thumbnail -> "<sha256 of its source image>:<width>"; staleness is decided by
+# content, since a git checkout resets the modification times of both files
+ICON_MANIFEST = "sources.json"
+
+def icon_source_key(src: Path, width: int) -> str:
+    return f"{hashlib.sha256(src.read_bytes()).hexdigest()}:{width}"
+
+def make_icon_thumbnail(src: Path, dst: Path, built: dict, width: int = ICON_PIXEL_WIDTH) -> bool:
+    """(Re)write dst as a width-px PNG thumbnail of src if missing or built from another image.
+
+    `built` is the manifest (updated in place). If the rewrite fails (e.g. a
+    read-only deployment), an existing thumbnail is kept rather than dropped.
+    """
+    key = icon_source_key(src, width)
+    if dst.exists() and built.get(dst.name) == key:
+        return True
+    try:
+        from PIL import Image
+
+        with Image.open(src) as im:
+            height = max(1, round(im.height * width / im.width))
+            thumb = im.convert("RGBA").resize((width, height), Image.LANCZOS)
+            thumb = thumb.quantize(256, method=Image.Quantize.FASTOCTREE)
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            thumb.save(dst, format="PNG", optimize=True)
+        built[dst.name] = key
+        return True
+    except Exception:
+        return dst.exists()
+
 @st.cache_resource
 def load_icons():
+    """System -> icon URL (static serving) or thumbnail path (fallback)."""
     base_dir = Path(__file__).resolve().parent
+    icon_dir = base_dir / "static" / "icons"
+    static_serving = bool(st.get_option("server.enableStaticServing"))
 
-    def safe_open(filename):
-        path = base_dir / filename
-        try:
-            return Image.open(path)
-        except Exception:
-            return None
+    manifest = icon_dir / ICON_MANIFEST
+    try:
+        built = json.loads(manifest.read_text())
+    except (OSError, ValueError):
+        built = {}
+    before = dict(built)
+
+    icons = {}
+    for system, filename in SYSTEM_ICON_FILES.items():
+        src = base_dir / filename
+        dst = icon_dir / filename
+        ok = make_icon_thumbnail(src, dst, built) if src.exists() else dst.exists()
+        if not ok:
+            icons[system] = None
+        elif static_serving:
+            icons[system] = f"app/static/icons/{filename}"
+        else:
+            icons[system] = str(dst)
 
-    return {
-        "1. Cardiorespiratory system": safe_open("cardio.png"),
-        "2. Digestive & Metabolic system": safe_open("gastro.png"),
-        "3. Neuro-Endocrine system": safe_open("neuro.png"),
-        "4. Immune / Hematolymphoid system": safe_open("immune.png"),
-        "5. Musculoskeletal & Integumentary system": safe_open("muscle.png"),
-        "6. Urogenital & Reproductive system": safe_open("reproductive.png"),
-        "Others system": safe_open("other.png"),
-    }
+    if built != before:
+        try:
+            manifest.write_text(json.dumps(built, indent=1, sort_keys=True) + "\n")
+        except OSError:
+            pass
+    return icons
+
+def render_system_icon(icon):
+    if icon is None:
+        return
+    if icon.startswith("app/static/"):
+        st.markdown(
+            f"<div class='sidebar-icon'><img src='{icon}' width='{ICON_DISPLAY_WIDTH}' alt=''></div>",
+            unsafe_allow_html=True,
+        )
+    else:
+        st.image(icon, width=ICON_DISPLAY_WIDTH)
 
 SYSTEM_ICONS = load_icons()
+lap("icons")
 
 # -----------------------------------------------------------
 # PREPROCESSING FIXES
 # -----------------------------------------------------------
-df = df.replace(["nan", "NaN", "NAN", "-", ""], pd.NA)
-
 expected_cols = [
     "miRNA",
     "Conservation",
@@ -437,20 +603,6 @@ expected_cols = [
     "sequence",
     "family_name_mirbase","family_name_mirgene",
 ]
-for c in expected_cols:
-    if c not in df.columns:
-        df[c] = pd.NA
-
-# Fix Class_MirGeneDB placeholder
-df["Class_MirGeneDB"] = df["Class_MirGeneDB"].fillna("—")
-df["Class_MirGeneDB"] = df["Class_MirGeneDB"].replace(
-    ["nan", "NaN", "NA", None, pd.NA, ""], "—"
-)
-
-# Fix family flags
-df["miRBase family"] = df["miRBase family"].fillna("NO")
-df["MirGeneDB family"] = df["MirGeneDB family"].fillna("—")
-
 # Repeat class cleanup
 def shorten_repeat(val):
     if not isinstance(val, str):
@@ -459,14 +611,6 @@ def shorten_repeat(val):
         val = val.split("(")[0]
     return val.split(",")[0].strip()
 
-df["Repeat_Class"] = df["Repeat_Class"].apply(shorten_repeat)
-df["Repeat_Class"] = df["Repeat_Class"].astype("string").str.replace("_", " ", regex=False)
-
-# Keep TRUE/FALSE text for these columns
-for c in ["Structure", "Conservation", "Expression"]:
-    if c in df.columns:
-        df[c] = df[c].map(lambda x: "TRUE" if x is True else ("FALSE" if x is False else x))
-
 # -----------------------------------------------------------
 # COLUMN GROUPS
 # -----------------------------------------------------------
@@ -475,7 +619,6 @@ animal_cols = [
     "Sus_scrofa","Bos_taurus","Mus_musculus","Gallus_gallus","Xenopus_tropicalis",
     "Danio_rerio","Takifugu_rubripes"
 ]
-animal_cols = [c for c in animal_cols if c in df.columns]
 
 tissue_cols = [
     "blood","colon","liver","brain","oral_cavity","plasma","lung","kidney","PBMC","heart","serum",
@@ -492,7 +635,6 @@ tissue_cols = [
     "grey_matter","pharynx","cd4","dermis","aqueous_humor","podocyte","choroid_plexus",
     "esophagus","theca","vaginal_tissue","mesenchymal_stem_cells","tonsil",
 ]
-tissue_cols = [c for c in tissue_cols if c and (c in df.columns)]
 
 # -----------------------------------------------------------
 # DISPLAY NAMES (species italic)
@@ -563,6 +705,104 @@ SYSTEM_TISSUES = {
 def system_display_name(system_key: str) -> str:
     return system_key.split(". ", 1)[-1].replace(" system", "")
 
+# -----------------------------------------------------------
+# HAIRPIN SEQUENCE FEATURES (one vectorized pass over all hairpins)
+# every sequence of a block of rows is one uint8 array of base codes; the
+# per-row features are segment reductions over it (bincount / reduceat), so
+# the cost grows linearly with the number of bases. They live in the column
+# store as one float32 row per feature
+# -----------------------------------------------------------
+SEQUENCE_BLOCK_ROWS = 50_000    # bounds the (rows x 64) triplet counts of one block
+DINUCLEOTIDES = [a + b for a in "ACGU" for b in "ACGU"]
+
+# feature -> (label, decimals shown); the order is the row order in the store
+SEQUENCE_FEATURES = {
+    "length": ("Hairpin length", 0),
+    "gc": ("GC content (%)", 1),
+    "homopolymer": ("Longest homopolymer", 0),
+    "dust": ("Low complexity (DUST)", 2),
+    **{f"di_{d}": (f"{d} frequency (%)", 1) for d in DINUCLEOTIDES},
+}
+SEQUENCE_FEATURE_NAMES = list(SEQUENCE_FEATURES)
+
+def sequence_codes(sequences):
+    """(codes, lengths): the bases of all sequences in one uint8 array (A/C/G/U-T -> 0-3, other -> 255)."""
+    seqs = [str(s).replace(" ", "").upper() if pd.notna(s) else "" for s in sequences]
+    lengths = np.fromiter((len(s) for s in seqs), dtype=np.int64, count=len(seqs))
+    buf = np.frombuffer("".join(seqs).encode("ascii", "replace"), dtype=np.uint8)
+
+    lut = np.full(256, 255, dtype=np.uint8)
+    for ch, code in (("A", 0), ("C", 1), ("G", 2), ("U", 3), ("T", 3)):
+        lut[ord(ch)] = code
+    return lut[buf], lengths
+
+def _block_features(codes, lengths):
+    """(features, rows) float32 for the rows of one block; rows without a sequence are NaN."""
+    m = len(lengths)
+    out = np.full((len(SEQUENCE_FEATURES), m), np.nan, dtype=np.float32)
+    has = lengths > 0
+    out[0, has] = lengths[has]
+    if not codes.size:
+        return out
+
+    owner = np.repeat(np.arange(m), lengths)
+    starts = np.cumsum(lengths) - lengths
+    first = np.zeros(codes.size, dtype=bool)        # first base of a sequence
+    first[starts[has]] = True
+
+    gc = np.bincount(owner, weights=(codes == 1) | (codes == 2), minlength=m)
+    out[1, has] = 100 * gc[has] / lengths[has]
+
+    # runs of one base: a run starts at every change of base and at every sequence start
+    run_starts = np.flatnonzero(first | np.r_[True, codes[1:] != codes[:-1]])
+    run_len = np.diff(np.r_[run_starts, codes.size])
+    run_len[codes[run_starts] == 255] = 0
+    if run_starts.size:
+        out[2, has] = np.maximum.reduceat(run_len, np.searchsorted(run_starts, starts[has]))
+
+    # dinucleotides / triplets: windows of valid bases inside one sequence
+    valid = codes < 4
+    pair_ok = valid[:-1] & valid[1:] & ~first[1:]
+    pair = codes[:-1].astype(np.int64) * 4 + codes[1:]
+    di = np.bincount(owner[:-1][pair_ok] * 16 + pair[pair_ok], minlength=m * 16).reshape(m, 16)
+    n_pairs = di.sum(axis=1)
+    ok = n_pairs > 0
+    out[4:, ok] = (100 * di[ok] / n_pairs[ok, None]).T
+
+    # DUST score (Morgulis et al. 2006) over the whole hairpin: sum of c*(c-1)/2
+    # over the counts c of its T triplets, / (T - 1); repeats score high
+    trip_ok = pair_ok[:-1] & pair_ok[1:]
+    trip = pair[:-1] * 4 + codes[2:]
+    tri = np.bincount(owner[:-2][trip_ok] * 64 + trip[trip_ok], minlength=m * 64).reshape(m, 64)
+    n_trip = tri.sum(axis=1)
+    ok = n_trip > 1
+    out[3, ok] = (tri[ok] * (tri[ok] - 1) // 2).sum(axis=1) / (n_trip[ok] - 1)
+    return out
+
+def sequence_features(sequences):
+    """(features, rows) float32 matrix of the SEQUENCE_FEATURES of every sequence."""
+    sequences = list(sequences)
+    out = np.empty((len(SEQUENCE_FEATURES), len(sequences)), dtype=np.float32)
+    for first in range(0, len(sequences), SEQUENCE_BLOCK_ROWS):
+        block = sequences[first:first + SEQUENCE_BLOCK_ROWS]
+        out[:, first:first + len(block)] = _block_features(*sequence_codes(block))
+    return out
+
+def sequence_bounds(features):
+    """Feature -> [min, max] over the table, widened to the decimals shown (slider bounds)."""
+    bounds = {}
+    for name, row in zip(SEQUENCE_FEATURE_NAMES, features):
+        decimals = SEQUENCE_FEATURES[name][1]
+        values = np.asarray(row, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not values.size:
+            bounds[name] = [0, 0]
+            continue
+        scale = 10 ** decimals
+        lo, hi = np.floor(values.min() * scale) / scale, np.ceil(values.max() * scale) / scale
+        bounds[name] = [int(lo), int(hi)] if decimals == 0 else [float(lo), float(hi)]
+    return bounds
+
 # -----------------------------------------------------------
 # RESET FILTERS (UX: show button only if something is active)
 # -----------------------------------------------------------
@@ -572,8 +812,11 @@ FILTER_KEYS = [
     "sb_conservation", "sb_expression", "sb_structure", "sb_hsa",
     "ms_family", "ms_repeat",
 
-    # repeat plot
-    "show_repeat_plot",
+    # summary plots
+    "show_repeat_plot", "show_species_plot", "show_breadth_plot", "show_system_plot",
+
+    # hairpin groups (display + FASTA export)
+    "group_hairpins", "fasta_one_per_group",
 
     # advanced toggle
     "show_adv",
@@ -581,6 +824,7 @@ FILTER_KEYS = [
     # conservation (advanced)
     "show_species_cols",
     "cons_species_found", "cons_species_na", "cons_stability_choice",
+    "cons_species_match", "cons_species_k", "cons_depth",
 
     # expression (advanced)
     "show_tissue_systems",
@@ -589,12 +833,26 @@ FILTER_KEYS = [
     "show_class_cols",
     "db_filter",
     "class_filter",
+
+    # hairpin sequence features (advanced)
+    "show_seq_features", "seq_filter", "seq_sort", "seq_sort_desc",
+
+    # family view ("expand result to whole families")
+    "expand_families",
+
+    # expression profile neighbours
+    "nn_query", "nn_k", "nn_metric", "nn_log", "nn_restrict",
+
+    # large-dataset mode page
+    "page",
 ]
 
 # Add dynamic keys for tissue system trees
 for sys_name in SYSTEM_TISSUES.keys():
     FILTER_KEYS.append(f"tree_pos_{sys_name}")
     FILTER_KEYS.append(f"tree_neg_{sys_name}")
+# ... and one range slider per sequence feature
+FILTER_KEYS.extend(f"seq_range_{name}" for name in SEQUENCE_FEATURES)
 
 def any_filter_active() -> bool:
     if (st.session_state.get("search_any", "") or "").strip():
@@ -616,7 +874,10 @@ def any_filter_active() -> bool:
     if st.session_state.get("ms_repeat", []):
         return True
 
-    if st.session_state.get("show_repeat_plot", False):
+    for plot_key in ("show_repeat_plot", "show_species_plot", "show_breadth_plot", "show_system_plot"):
+        if st.session_state.get(plot_key, False):
+            return True
+    if st.session_state.get("group_hairpins", False):
         return True
 
     if st.session_state.get("show_adv", False):
@@ -630,6 +891,10 @@ def any_filter_active() -> bool:
         return True
     if st.session_state.get("cons_stability_choice", "All") != "All":
         return True
+    if st.session_state.get("cons_species_match", "All of them") != "All of them":
+        return True
+    if st.session_state.get("cons_depth", "Any") != "Any":
+        return True
 
     if st.session_state.get("show_tissue_systems", []):
         return True
@@ -647,6 +912,19 @@ def any_filter_active() -> bool:
     if st.session_state.get("class_filter", []):
         return True
 
+    if st.session_state.get("show_seq_features", []):
+        return True
+    if st.session_state.get("seq_filter", []):
+        return True
+    if st.session_state.get("seq_sort", "Table order") != "Table order":
+        return True
+
+    if st.session_state.get("expand_families"):
+        return True
+
+    if st.session_state.get("nn_query"):
+        return True
+
     return False
 
 # -----------------------------------------------------------
@@ -657,188 +935,1880 @@ binary_map = {
     "FALSE": False, False: False, 0: False,
     "NA": pd.NA, None: pd.NA, pd.NA: pd.NA, "": pd.NA
 }
-if animal_cols:
-    df[animal_cols] = df[animal_cols].applymap(lambda x: binary_map.get(x, pd.NA))
 
 # -----------------------------------------------------------
-# Helper columns for filtering + display helpers
+# PREPARE TABLE (cleanup + helper columns for filtering / display)
 # -----------------------------------------------------------
-df["_Structure_tf"] = df["Structure"].astype(str).str.upper()
-df["_Expression_tf"] = df["Expression"].astype(str).str.upper()
-df["_Conservation_tf"] = df["Conservation"].astype("string").str.strip().str.upper()
+def normalize_table(data):
+    """NA cleanup, placeholder fixes, species states and the filter helper columns."""
+    data = data.replace(["nan", "NaN", "NAN", "-", ""], pd.NA)
+
+    missing = [c for c in expected_cols if c not in data.columns]
+    if missing:
+        data = pd.concat([data, pd.DataFrame(pd.NA, index=data.index, columns=missing)], axis=1)
+
+    # Fix Class_MirGeneDB placeholder
+    data["Class_MirGeneDB"] = data["Class_MirGeneDB"].fillna("—")
+    data["Class_MirGeneDB"] = data["Class_MirGeneDB"].replace(
+        ["nan", "NaN", "NA", None, pd.NA, ""], "—"
+    )
 
-df["_miRBase_family_flag"] = df["miRBase family"].astype(str).str.upper()
-df["_MirGeneDB_family_flag"] = df["MirGeneDB family"].astype(str).str.upper()
+    # Fix family flags
+    data["miRBase family"] = data["miRBase family"].fillna("NO")
+    data["MirGeneDB family"] = data["MirGeneDB family"].fillna("—")
 
-df["Conservation_display"] = (
-    df[animal_cols].apply(lambda r: r.isin([True, False]).sum(), axis=1) if animal_cols else pd.NA
-)
+    data["Repeat_Class"] = data["Repeat_Class"].apply(shorten_repeat)
+    data["Repeat_Class"] = data["Repeat_Class"].astype("string").str.replace("_", " ", regex=False)
+
+    # Keep TRUE/FALSE text for these columns
+    for c in ["Structure", "Conservation", "Expression"]:
+        if c in data.columns:
+            data[c] = data[c].map(lambda x: "TRUE" if x is True else ("FALSE" if x is False else x))
+
+    if animal_cols:
+        data[animal_cols] = data[animal_cols].applymap(lambda x: binary_map.get(x, pd.NA))
+
+    data["_Structure_tf"] = data["Structure"].astype(str).str.upper()
+    data["_Expression_tf"] = data["Expression"].astype(str).str.upper()
+    data["_Conservation_tf"] = data["Conservation"].astype("string").str.strip().str.upper()
+
+    data["_miRBase_family_flag"] = data["miRBase family"].astype(str).str.upper()
+    data["_MirGeneDB_family_flag"] = data["MirGeneDB family"].astype(str).str.upper()
+    return data
+
+def class_label(values, empty=("",)):
+    """Stripped class names of `values`, with "-" for NA and the `empty` placeholders."""
+    text = values.astype("string").str.strip()
+    return text.mask(values.isna() | text.isin(empty), "-")
+
+def family_display(flags, names):
+    """Family name where the family flag is YES and a name is given, None otherwise."""
+    text = names.astype("string").str.strip()
+    keep = flags.astype(str).str.strip().str.upper().eq("YES") & names.notna() & text.ne("")
+    return pd.Series(np.where(keep, text.to_numpy(dtype=object), None), index=names.index, dtype=object)
+
+def prepare_table(data):
+    """normalize_table + the display columns of the web table (whole-column operations)."""
+    data = normalize_table(data)
+
+    data["Conservation_display"] = data[animal_cols].isin([True, False]).sum(axis=1) if animal_cols else pd.NA
+
+    if tissue_cols:
+        data["Expression_display"] = (tissue_matrix(data) >= 1.5).sum(axis=1)
+    else:
+        data["Expression_display"] = pd.NA
+
+    data["Structure_display"] = (
+        class_label(data["Class_miRBase"]) + "/" + class_label(data["Class_MirGeneDB"], empty=("", "—"))
+    ).astype(object)
 
-if tissue_cols:
-    tissue_num_all = df[tissue_cols].apply(pd.to_numeric, errors="coerce")
-    df["Expression_display"] = (tissue_num_all >= 1.5).sum(axis=1)
+    data["miRBase_family_display"] = family_display(data["miRBase family"], data["family_name_mirbase"])
+    data["MirGeneDB_family_display"] = family_display(data["MirGeneDB family"], data["family_name_mirgene"])
+    return data
+
+# -----------------------------------------------------------
+# COLUMN STORE (encoded filter dimensions, species states, tissue values)
+# filters run on these arrays only; in large-dataset mode they are
+# memory-mapped files and only the displayed page of rows is parsed. The
+# text search runs on a copy of the prepared values (search.txt), so it
+# matches exactly what the in-memory search matches
+# -----------------------------------------------------------
+_OTHER = "OTHER"
+TISSUE_DTYPE = np.float32
+STORE_CHUNK_ROWS = 100_000
+COLUMN_STORE_FORMAT = 3
+
+def _flag(series):
+    return series.astype("string").str.strip().str.upper()
+
+def cube_dimension_frame(data):
+    """One discrete, already-normalized column per filter dimension."""
+    db = np.where(
+        data["Class_miRBase"].eq(data["Class_MirGeneDB"]).fillna(False),
+        "both",
+        np.where(data["Class_miRBase"].notna() & data["Class_MirGeneDB"].eq("—"), "only_mirbase", _OTHER),
+    )
+    return pd.DataFrame({
+        "Repeat_Class": data["Repeat_Class"],
+        "Structure": _flag(data["_Structure_tf"]),
+        "Conservation": _flag(data["_Conservation_tf"]),
+        "Expression": _flag(data["_Expression_tf"]),
+        "hsa": _flag(data["hsa-specificity"]),
+        "miRBase_family": _flag(data["miRBase family"]),
+        "MirGeneDB_family": _flag(data["MirGeneDB family"]),
+        "db": db,
+        "Class_miRBase": data["Class_miRBase"],
+    })
+
+CUBE_DIMS = [
+    "Repeat_Class", "Structure", "Conservation", "Expression", "hsa",
+    "miRBase_family", "MirGeneDB_family", "db", "Class_miRBase",
+]
+
+CUBE_FIXED_LEVELS = {
+    "Structure": ["TRUE", "FALSE"],
+    "Conservation": ["TRUE", "FALSE"],
+    "Expression": ["TRUE", "FALSE"],
+    "hsa": ["YES", "NO"],
+    "miRBase_family": ["YES", "NO"],
+    "MirGeneDB_family": ["YES", "NO"],
+    "db": ["both", "only_mirbase"],
+}
+
+def species_states(species_frame):
+    """(rows, species) int8: 0 = stable structure, 1 = unstable structure, 2 = not found."""
+    states = np.full(species_frame.shape, 2, dtype=np.int8)
+    states[species_frame.eq(True).to_numpy()] = 0
+    states[species_frame.eq(False).to_numpy()] = 1
+    return states
+
+def tissue_matrix(data):
+    """(rows, tissues) RPMM values; non-numeric cells become NaN."""
+    return data[tissue_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=TISSUE_DTYPE)
+
+def dataset_version(path):
+    """Changes whenever the table file is replaced or edited."""
+    stat = os.stat(path)
+    return f"{Path(path).name}:{stat.st_size}:{stat.st_mtime_ns}"
+
+def read_only(value):
+    """`value` with every NumPy array (in nested dicts / lists / tuples) marked read-only.
+
+    Process-wide objects are shared by all sessions: writing into one of their
+    buffers raises instead of silently changing the table of every session.
+    """
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, pd.DataFrame):
+        return read_only_frame(value)
+    elif isinstance(value, dict):
+        return {k: read_only(v) for k, v in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return type(value)(read_only(v) for v in value)
+    return value
+
+def read_only_frame(data):
+    """Copy of `data` with one read-only buffer per column.
+
+    Columns are not consolidated into 2-D blocks, so no pandas operation can
+    write into them in place; anything that modifies the frame makes a copy.
+    """
+    columns = {}
+    for col in data.columns:
+        values = data[col].array.copy()             # own buffer, not a view of a shared block
+        np.asarray(values).setflags(write=False)    # NumPy-backed arrays (incl. strings) share it
+        columns[col] = values
+    return pd.DataFrame(columns, index=data.index, copy=False)
+
+def build_memory_store(_data, version):
+    """Column store of an in-memory (normalized) table."""
+    sequence = sequence_features(_data["sequence"])
+    dims = cube_dimension_frame(_data)
+    levels, codes = {}, np.empty((len(CUBE_DIMS), len(dims)), dtype=np.uint8)
+    for j, name in enumerate(CUBE_DIMS):
+        known = CUBE_FIXED_LEVELS.get(name) or sorted(dims[name].dropna().unique())
+        c = pd.Categorical(dims[name], categories=known).codes.astype(np.int64)
+        c[c < 0] = len(known)
+        codes[j] = c
+        levels[name] = list(known) + [_OTHER]
+
+    return {
+        "version": version,
+        "n": len(_data),
+        "dims": CUBE_DIMS,
+        "levels": levels,
+        "codes": codes,
+        "species": np.ascontiguousarray(species_states(_data[animal_cols]).T),
+        "tissues": np.ascontiguousarray(tissue_matrix(_data).T),
+        "sequence": sequence,
+        "sequence_bounds": sequence_bounds(sequence),
+        "offsets": None,
+    }
+
+def search_text(data):
+    """(text, chars, bytes): every value of `data` as searched in memory, one per line, and the per-row lengths."""
+    values = [data[col].astype(str) for col in data.columns]
+    rows = values[0].str.cat(values[1:], sep="\n") + "\n"
+    chars = rows.str.len().to_numpy(dtype=np.int64)
+    text = "".join(rows)
+    encoded = text.encode("utf-8")
+    if len(encoded) == len(text):       # ASCII only: bytes and characters line up
+        return encoded, chars, chars
+    return encoded, chars, rows.map(lambda r: len(r.encode("utf-8"))).to_numpy(dtype=np.int64)
+
+def _row_offsets(path):
+    """(header bytes, byte offset of every data row + end of file); one record per line."""
+    with open(path, "rb") as fh:
+        header = fh.readline()
+        pos = len(header)
+        parts = [np.array([pos], dtype=np.int64)]
+        while True:
+            chunk = fh.read(1 << 26)
+            if not chunk:
+                break
+            parts.append(np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == 10) + pos + 1)
+            pos += len(chunk)
+        offsets = np.concatenate(parts)
+        if offsets[-1] != pos:      # last row without a trailing newline
+            offsets = np.append(offsets, pos)
+
+        # blank lines are skipped by read_csv: drop their starts (the previous row absorbs them)
+        blank = []
+        for i in np.flatnonzero(np.diff(offsets) <= 2):
+            fh.seek(offsets[i])
+            if not fh.read(int(offsets[i + 1] - offsets[i])).strip():
+                blank.append(i)
+    return header, np.delete(offsets, blank)
+
+def build_column_store(path, store_dir, version):
+    """Stream the table in chunks into memory-mappable .npy files under store_dir."""
+    header, offsets = _row_offsets(path)
+    n = len(offsets) - 1
+
+    tmp_dir = store_dir.with_name(store_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    open_memmap = np.lib.format.open_memmap
+    codes = open_memmap(tmp_dir / "codes.npy", mode="w+", dtype=np.uint8, shape=(len(CUBE_DIMS), n))
+    species = open_memmap(tmp_dir / "species.npy", mode="w+", dtype=np.int8, shape=(len(animal_cols), n))
+    tissues = open_memmap(tmp_dir / "tissues.npy", mode="w+", dtype=TISSUE_DTYPE, shape=(len(tissue_cols), n))
+    sequence = open_memmap(tmp_dir / "sequence.npy", mode="w+", dtype=np.float32, shape=(len(SEQUENCE_FEATURES), n))
+    # search.txt offsets: row 0 in bytes (to seek), row 1 in characters (to map a match to its row)
+    search_offsets = np.zeros((2, n + 1), dtype=np.int64)
+    search_file = open(tmp_dir / "search.txt", "wb")
+
+    # codes are provisional (order of first appearance, 255 = OTHER/NA) until all levels are known
+    seen = {name: {v: i for i, v in enumerate(CUBE_FIXED_LEVELS.get(name, []))} for name in CUBE_DIMS}
+    start = 0
+    for chunk in pd.read_csv(path, chunksize=STORE_CHUNK_ROWS):
+        chunk = prepare_table(chunk)
+        stop = start + len(chunk)
+        if stop > n:
+            break
+        text, chars, nbytes = search_text(chunk)
+        search_file.write(text)
+        search_offsets[0, start + 1:stop + 1] = search_offsets[0, start] + np.cumsum(nbytes)
+        search_offsets[1, start + 1:stop + 1] = search_offsets[1, start] + np.cumsum(chars)
+        dims = cube_dimension_frame(chunk)
+        for j, name in enumerate(CUBE_DIMS):
+            values = dims[name]
+            if name not in CUBE_FIXED_LEVELS:
+                for v in pd.unique(values.dropna()):
+                    seen[name].setdefault(v, len(seen[name]))
+                if len(seen[name]) >= 255:
+                    raise ValueError(f"Too many distinct values in {name} for the column store")
+            codes[j, start:stop] = pd.Series(values).map(seen[name]).fillna(255).to_numpy(dtype=np.uint8)
+        species[:, start:stop] = species_states(chunk[animal_cols]).T
+        tissues[:, start:stop] = tissue_matrix(chunk).T
+        sequence[:, start:stop] = sequence_features(chunk["sequence"])
+        start = stop
+    search_file.close()
+    if start != n:
+        raise ValueError(f"{path}: expected one record per line ({n} lines, {start} parsed rows)")
+
+    levels = {}
+    for j, name in enumerate(CUBE_DIMS):
+        known = CUBE_FIXED_LEVELS.get(name) or sorted(seen[name])
+        lut = np.full(256, len(known), dtype=np.uint8)
+        for v, code in seen[name].items():
+            lut[code] = known.index(v)
+        codes[j] = lut[codes[j]]
+        levels[name] = list(known) + [_OTHER]
+
+    bounds = sequence_bounds(sequence)
+    for arr in (codes, species, tissues, sequence):
+        arr.flush()
+    del codes, species, tissues, sequence
+    np.save(tmp_dir / "offsets.npy", offsets)
+    np.save(tmp_dir / "search_offsets.npy", search_offsets)
+    (tmp_dir / "header.csv").write_bytes(header)
+    (tmp_dir / "meta.json").write_text(json.dumps({
+        "format": COLUMN_STORE_FORMAT, "version": version, "n": n, "dims": CUBE_DIMS, "levels": levels,
+        "sequence_bounds": bounds,
+    }))
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+
+@st.cache_resource(max_entries=RELEASE_CACHE_SIZE, show_spinner="Preparing column store…")
+def open_column_store(path, version):
+    """Memory-mapped column store of `path`, rebuilt when the table changes."""
+    store_dir = Path(COLUMN_STORE_DIR or Path(path).parent) / (Path(path).name + ".colstore")
+    meta_file = store_dir / "meta.json"
+    meta = json.loads(meta_file.read_text()) if meta_file.exists() else {}
+    if meta.get("format") != COLUMN_STORE_FORMAT or meta.get("version") != version:
+        build_column_store(path, store_dir, version)
+        meta = json.loads(meta_file.read_text())
+
+    return read_only({
+        "version": version,
+        "n": meta["n"],
+        "dims": meta["dims"],
+        "levels": meta["levels"],
+        "codes": np.load(store_dir / "codes.npy", mmap_mode="r"),
+        "species": np.load(store_dir / "species.npy", mmap_mode="r"),
+        "tissues": np.load(store_dir / "tissues.npy", mmap_mode="r"),
+        "sequence": np.load(store_dir / "sequence.npy", mmap_mode="r"),
+        "sequence_bounds": meta["sequence_bounds"],
+        "offsets": np.load(store_dir / "offsets.npy"),
+        "header": (store_dir / "header.csv").read_bytes(),
+        "source": str(path),
+        "search_offsets": np.load(store_dir / "search_offsets.npy"),
+        "search_file": str(store_dir / "search.txt"),
+    })
+
+def read_rows(store, ids):
+    """Parse (and prepare) only rows `ids` of a large table, using the row byte offsets."""
+    offsets = store["offsets"]
+    with open(store["source"], "rb") as fh:
+        lines = []
+        for i in ids:
+            fh.seek(offsets[i])
+            lines.append(fh.read(offsets[i + 1] - offsets[i]).rstrip(b"\r\n") + b"\n")
+    page = pd.read_csv(io.BytesIO(store["header"] + b"".join(lines)))
+    page.index = pd.Index(ids)
+    return prepare_table(page)
+
+def search_pattern(term):
+    """Case-insensitive regex of a search term; a term that is not a valid regex is matched literally."""
+    try:
+        return re.compile(term, re.IGNORECASE)
+    except re.error:
+        return re.compile(re.escape(term), re.IGNORECASE)
+
+# lookarounds and \A / \Z see past the value they match in: such terms are matched value by value
+_CROSSES_VALUES = re.compile(r"\(\?<?[=!]|\\[AZ]")
+
+def search_rows(store, term):
+    """Row ids with a prepared value matching `term`, as in memory, from the store's search text.
+
+    Values are one per line, so with MULTILINE ^ and $ anchor at value
+    boundaries: a match within one line is a hit. A match spanning lines is
+    checked again value by value, and the scan resumes at the next row.
+    """
+    pattern = search_pattern(term)
+    lines = re.compile(pattern.pattern, pattern.flags | re.MULTILINE)
+    by_value = bool(_CROSSES_VALUES.search(pattern.pattern))
+
+    offsets = store["search_offsets"]
+    hits = []
+    with open(store["search_file"], "rb") as fh:
+        for first in range(0, store["n"], STORE_CHUNK_ROWS):
+            last = min(first + STORE_CHUNK_ROWS, store["n"])
+            fh.seek(offsets[0, first])
+            text = fh.read(offsets[0, last] - offsets[0, first]).decode("utf-8")
+            starts = (offsets[1, first:last + 1] - offsets[1, first]).tolist()
+
+            def row_matches(row):
+                return any(pattern.search(value) for value in text[starts[row]:starts[row + 1] - 1].split("\n"))
+
+            if by_value:
+                hits.extend(first + row for row in range(last - first) if row_matches(row))
+                continue
+            pos = 0
+            while (m := lines.search(text, pos)) is not None:
+                row = bisect.bisect_right(starts, m.start()) - 1
+                if row >= last - first:
+                    break
+                if "\n" not in m.group() or row_matches(row):
+                    hits.append(first + row)
+                pos = starts[row + 1]
+    return np.array(hits, dtype=np.int64)
+
+# -----------------------------------------------------------
+# HOT RELOAD (in-memory mode)
+# a watcher thread polls the table file; a new version is diffed against the
+# live one by a content hash of every raw row, keyed on miRNA, and only the
+# changed / added rows are prepared and encoded again. The new release is
+# published as one snapshot, so a session sees either the old or the new table.
+# Sessions pick it up on their next rerun (the snapshot is process-wide); idle
+# tabs only reload on their own when MIRRF_REFRESH_SECONDS is set, since every
+# open tab then sends a rerun to the server at that interval
+# -----------------------------------------------------------
+WATCH_SECONDS = float(os.environ.get("MIRRF_WATCH_SECONDS", "2"))   # 0 = check on every rerun instead
+REFRESH_SECONDS = float(os.environ.get("MIRRF_REFRESH_SECONDS", "0"))   # 0 = idle tabs are not polled
+
+def row_hashes(raw):
+    """uint64 content hash of every raw table row (all columns, index ignored)."""
+    return pd.util.hash_pandas_object(raw, index=False).to_numpy()
+
+def unchanged_rows(old, raw, hashes):
+    """Position in `old` of every row of `raw` with the same miRNA and content (-1 = changed or new).
+
+    None when rows cannot be matched: different columns / dtypes or duplicated miRNA keys.
+    """
+    if old is None or "miRNA" not in raw.columns or list(raw.columns) != old["raw_columns"]:
+        return None
+    if not raw.dtypes.equals(old["raw_dtypes"]) or not raw["miRNA"].is_unique or not old["keys"].is_unique:
+        return None
+    reuse = old["keys"].get_indexer(raw["miRNA"])
+    same = reuse >= 0
+    same[same] = old["hashes"][reuse[same]] == hashes[same]
+    return np.where(same, reuse, -1)
+
+def prepare_changed(old_data, raw, reuse):
+    """Prepared table of `raw`: unchanged rows are taken from old_data, the others are prepared."""
+    kept = np.flatnonzero(reuse >= 0)
+    changed = np.flatnonzero(reuse < 0)
+    parts = []
+    if kept.size:
+        part = old_data.iloc[reuse[kept]]
+        part.index = kept
+        parts.append(part)
+    if changed.size:
+        parts.append(prepare_table(raw.iloc[changed]))
+    data = pd.concat(parts).sort_index() if len(parts) > 1 else parts[0]
+    data.index = pd.RangeIndex(len(data))
+    if list(data.columns) != list(old_data.columns) or not data.dtypes.equals(old_data.dtypes):
+        return None
+    return data
+
+def update_memory_store(old_store, data, reuse, version):
+    """Column store of `data` reusing the encoded rows of old_store; None if the levels changed."""
+    kept = np.flatnonzero(reuse >= 0)
+    changed = np.flatnonzero(reuse < 0)
+    dims = cube_dimension_frame(data.iloc[changed])
+
+    codes = np.empty((len(CUBE_DIMS), len(data)), dtype=np.uint8)
+    codes[:, kept] = old_store["codes"][:, reuse[kept]]
+    for j, name in enumerate(CUBE_DIMS):
+        known = old_store["levels"][name][:-1]
+        c = pd.Categorical(dims[name], categories=known).codes.astype(np.int64)
+        if name not in CUBE_FIXED_LEVELS and ((c < 0) & dims[name].notna().to_numpy()).any():
+            return None         # a value never seen before: the level list changes
+        c[c < 0] = len(known)
+        codes[j, changed] = c
+        if name not in CUBE_FIXED_LEVELS and np.bincount(codes[j], minlength=len(known) + 1)[:-1].min() == 0:
+            return None         # a level is gone from the table
+
+    def gather(old, fresh):
+        out = np.empty((old.shape[0], len(data)), dtype=old.dtype)
+        out[:, kept] = old[:, reuse[kept]]
+        out[:, changed] = fresh.T
+        return out
+
+    sequence = gather(old_store["sequence"], sequence_features(data["sequence"].iloc[changed]).T)
+    return {
+        **old_store,
+        "version": version,
+        "n": len(data),
+        "codes": codes,
+        "species": gather(old_store["species"], species_states(data[animal_cols].iloc[changed])),
+        "tissues": gather(old_store["tissues"], tissue_matrix(data.iloc[changed])),
+        "sequence": sequence,
+        "sequence_bounds": sequence_bounds(sequence),
+    }
+
+def load_snapshot(path, version, old=None):
+    """Prepared table + column store of `path`, derived incrementally from `old` when possible."""
+    raw = pd.read_csv(path)
+    hashes = row_hashes(raw)
+    reuse = unchanged_rows(old, raw, hashes)
+
+    data = store = None
+    if reuse is not None:
+        data = prepare_changed(old["data"], raw, reuse)
+        if data is not None:
+            store = update_memory_store(old["store"], data, reuse, version)
+    if store is None:
+        data = prepare_table(raw)
+        store = build_memory_store(data, version)
+        changes = diff = None
+    else:
+        changes = {
+            "changed": int((reuse < 0).sum() - (~raw["miRNA"].isin(old["keys"])).sum()),
+            "added": int((~raw["miRNA"].isin(old["keys"])).sum()),
+            "removed": int((~old["keys"].isin(raw["miRNA"])).sum()),
+        }
+        dropped = np.setdiff1d(np.arange(old["store"]["n"]), reuse[reuse >= 0])
+        diff = {
+            "from": old["version"],
+            "reuse": reuse,                 # old position of every row, -1 = changed or added
+            "dropped": dropped,             # old positions of the changed and removed rows
+            "dropped_codes": old["store"]["codes"][:, dropped],
+        }
+
+    return {
+        "version": version,
+        "data": read_only_frame(data),    # one copy per process, shared by every session
+        "store": read_only(store),
+        "keys": pd.Index(raw["miRNA"]) if "miRNA" in raw.columns else pd.Index([]),
+        "hashes": hashes,
+        "raw_columns": list(raw.columns),
+        "raw_dtypes": raw.dtypes,
+        "changes": changes,     # row counts vs the previous version (None = full rebuild)
+        "diff": read_only(diff),    # rows reused from the previous version, for the derived artifacts
+    }
+
+def refresh_release(live):
+    """Load the table again if the file changed; returns the (possibly new) current snapshot."""
+    with live["lock"]:
+        current = live["current"]
+        version = dataset_version(live["path"])
+        if version != current["version"]:
+            live["current"] = load_snapshot(live["path"], version, current)
+        return live["current"]
+
+def watch_release(live):
+    """Watcher thread: reload once the file has a new version that stayed the same for one poll."""
+    seen = live["current"]["version"]
+    while not live["stop"].wait(WATCH_SECONDS):     # set once the release is evicted from the cache
+        try:
+            version = dataset_version(live["path"])
+            if version == live["current"]["version"]:
+                seen = version
+            elif version == seen:           # unchanged since the last poll: the write is complete
+                refresh_release(live)
+            else:
+                seen = version
+        except Exception as exc:            # a half-written / unreadable table: keep serving the old one
+            live["error"] = repr(exc)
+
+def stop_watching(live):
+    """Release hook of live_release: the watcher of an evicted release stops polling its file."""
+    live["stop"].set()
+
+@st.cache_resource(max_entries=RELEASE_CACHE_SIZE, show_spinner="Loading release…", on_release=stop_watching)
+def live_release(path):
+    """Process-wide holder of the current snapshot of one release, kept up to date by a watcher."""
+    live = {"path": path, "lock": threading.Lock(), "error": None, "stop": threading.Event()}
+    live["current"] = load_snapshot(path, dataset_version(path))
+    if WATCH_SECONDS > 0:
+        threading.Thread(
+            target=watch_release, args=(live,), name=f"release-watch-{Path(path).name}", daemon=True,
+        ).start()
+    return live
+
+if LARGE_MODE:
+    df = None
+    DATA_VERSION = dataset_version(DATA_FILE)
+    DATA_DIFF = None
+    STORE = open_column_store(DATA_FILE, DATA_VERSION)
 else:
-    df["Expression_display"] = pd.NA
+    LIVE_RELEASE = live_release(DATA_FILE)
+    # one read of the current snapshot: table, store and version always belong together
+    snapshot = LIVE_RELEASE["current"] if WATCH_SECONDS > 0 else refresh_release(LIVE_RELEASE)
+    DATA_VERSION, df, STORE = snapshot["version"], snapshot["data"], snapshot["store"]
+    DATA_DIFF = snapshot["diff"]
+    lap("load")
+# columns of the prepared table (display, exports and FASTA project from these)
+TABLE_COLUMNS = list(df.columns) if df is not None else list(read_rows(STORE, []).columns)
+lap("preprocess")
+
+@st.fragment(run_every=REFRESH_SECONDS if REFRESH_SECONDS > 0 and not LARGE_MODE else None)
+def release_watch():
+    """Opt-in poll of an idle tab: reruns the whole app when the watcher has published a newer version."""
+    if not LARGE_MODE and LIVE_RELEASE["current"]["version"] != DATA_VERSION:
+        st.rerun()
 
-def format_class_pair(row):
-    a = row.get("Class_miRBase", pd.NA)
-    b = row.get("Class_MirGeneDB", pd.NA)
-    a = "-" if pd.isna(a) or str(a).strip() == "" else str(a).strip()
-    b = "-" if pd.isna(b) or str(b).strip() in ["", "—"] else str(b).strip()
-    return f"{a}/{b}"
+# version of each release this session last showed: switching release is not an update
+seen_versions = st.session_state.setdefault("_data_versions", {})
+seen_version = seen_versions.get(DATA_FILE)
+if seen_version is not None and seen_version != DATA_VERSION and not LARGE_MODE:
+    changes = snapshot["changes"]
+    if changes is None:
+        st.toast("The table was updated.")
+    else:
+        st.toast(
+            f"The table was updated: {changes['changed']} rows changed, "
+            f"{changes['added']} added, {changes['removed']} removed."
+        )
+seen_versions[DATA_FILE] = DATA_VERSION
+if REFRESH_SECONDS > 0:
+    release_watch()
 
-df["Structure_display"] = df.apply(format_class_pair, axis=1)
+# -----------------------------------------------------------
+# DERIVED ARTIFACTS (background worker pool)
+# full-table structures that only some panels need are registered below and
+# built by a process-wide thread pool once the first page has been served, so
+# adding one does not delay the first table. A feature asks for its artifact
+# and gets None while it is being built (and falls back), or waits for it.
+# An artifact with an update function is derived from its previous version
+# when the table was reloaded with a row diff (see HOT RELOAD)
+# -----------------------------------------------------------
+ARTIFACT_WORKERS = int(os.environ.get("MIRRF_ARTIFACT_WORKERS", "2"))
+ARTIFACT_POLL_SECONDS = 1.0
+ARTIFACTS = {}      # name -> (label, build function bound to the current table, update function or None)
 
-def family_name_or_single(flag_val, name_val, empty_as=None):
-    if str(flag_val).strip().upper() == "YES":
-        if pd.isna(name_val) or str(name_val).strip() == "":
-            return None
-        return str(name_val).strip()
-    return empty_as
-
-df["miRBase_family_display"] = df.apply(
-    lambda r: family_name_or_single(
-        r.get("miRBase family", "NO"),
-        r.get("family_name_mirbase", pd.NA),
-        empty_as=None
-    ),
-    axis=1
-)
+@st.cache_resource
+def artifact_pool():
+    return {
+        "executor": ThreadPoolExecutor(max_workers=ARTIFACT_WORKERS, thread_name_prefix="artifact"),
+        "futures": OrderedDict(),   # (name, path, version) -> Future, least recently used first
+        "lock": threading.Lock(),
+    }
 
-df["MirGeneDB_family_display"] = df.apply(
-    lambda r: family_name_or_single(
-        r.get("MirGeneDB family", "—"),
-        r.get("family_name_mirgene", pd.NA),
-        empty_as=None
-    ),
-    axis=1
-)
+ARTIFACT_POOL = artifact_pool()
+
+def register_artifact(name, label, build, update=None):
+    """`update(previous, diff)` returns the artifact from the one of the previous version, or None to build it."""
+    ARTIFACTS[name] = (label, build, update)
+
+def update_artifact(update, previous, diff, build):
+    value = update(previous, diff)
+    return build() if value is None else value
+
+def artifact_task(name, futures):
+    """Build function of artifact `name`: an update of the previous version's artifact when that one is ready."""
+    _, build, update = ARTIFACTS[name]
+    if update is None or DATA_DIFF is None:
+        return build
+    previous = futures.get((name, DATA_FILE, DATA_DIFF["from"]))
+    if previous is None or not previous.done() or previous.exception() is not None:
+        return build
+    return functools.partial(update_artifact, update, previous.result(), DATA_DIFF, build)
+
+def artifact_future(name):
+    """Future of artifact `name` for the current table version; queued on the pool on first request."""
+    key = (name, DATA_FILE, DATA_VERSION)
+    with ARTIFACT_POOL["lock"]:
+        futures = ARTIFACT_POOL["futures"]
+        future = futures.get(key)
+        if future is None:
+            future = futures[key] = ARTIFACT_POOL["executor"].submit(artifact_task(name, futures))
+            while len(futures) > RELEASE_CACHE_SIZE * len(ARTIFACTS):
+                futures.popitem(last=False)
+        futures.move_to_end(key)
+    return future
+
+def artifact(name, wait=False):
+    """Artifact `name` of the current table; None if it is not registered, or not ready and wait is False.
+
+    With wait=True a failed build raises; otherwise it is treated as not available.
+    """
+    if name not in ARTIFACTS:
+        return None
+    future = artifact_future(name)
+    if not wait and (not future.done() or future.exception() is not None):
+        return None
+    return future.result()
+
+def artifact_states():
+    """name -> "ready" / "building" / "queued" / "failed" for the current table (nothing is queued here)."""
+    with ARTIFACT_POOL["lock"]:
+        futures = {name: ARTIFACT_POOL["futures"].get((name, DATA_FILE, DATA_VERSION)) for name in ARTIFACTS}
+    states = {}
+    for name, future in futures.items():
+        if future is None or not (future.running() or future.done()):
+            states[name] = "queued"
+        elif not future.done():
+            states[name] = "building"
+        else:
+            states[name] = "failed" if future.exception() is not None else "ready"
+    return states
 
 # -----------------------------------------------------------
-# TITLE
+# EXPRESSION PROFILE INDEX (nearest neighbours over tissue columns)
+# rows are normalized once, so a query is one matrix-vector product
 # -----------------------------------------------------------
-st.title("miR-RF Browser")
-st.markdown(
-    "Interactively explore and filter pre-miRNA annotations by species conservation, tissue expression, repeat classification and family context."
+NN_METRICS = ["Cosine", "Spearman"]
+
+def _unit_rows(mat):
+    norms = np.linalg.norm(mat, axis=1)
+    valid = norms > 0
+    out = np.zeros_like(mat)
+    out[valid] = mat[valid] / norms[valid, None]
+    return out, valid
+
+def build_profile_index(values):
+    """Precompute unit-norm profile matrices for every (metric, log) variant."""
+    x = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+    x = np.clip(x, 0, None)
+
+    index = {}
+    for use_log in (False, True):
+        xv = np.log1p(x) if use_log else x
+        mat, valid = _unit_rows(xv)
+        index[("Cosine", use_log)] = (mat.astype(np.float32), valid)
+
+    # Spearman = Pearson on per-row ranks; log1p is monotone so ranks are unchanged
+    ranks = pd.DataFrame(x).rank(axis=1).to_numpy()
+    ranks -= ranks.mean(axis=1, keepdims=True)
+    mat, valid = _unit_rows(ranks)
+    for use_log in (False, True):
+        index[("Spearman", use_log)] = (mat.astype(np.float32), valid)
+
+    return read_only(index)
+
+def nearest_profiles(index, row_pos, k, metric="Cosine", use_log=False, candidates=None):
+    """Return (positions, similarities) of the k rows most similar to row_pos (among row ids `candidates`)."""
+    mat, valid = index[(metric, use_log)]
+    if not valid[row_pos]:
+        return np.array([], dtype=int), np.array([], dtype=np.float32)
+
+    sims = mat @ mat[row_pos]
+    if candidates is None:
+        allowed = valid.copy()
+    else:
+        allowed = np.zeros_like(valid)
+        allowed[candidates] = valid[candidates]
+    allowed[row_pos] = False
+
+    pool = np.flatnonzero(allowed)
+    if pool.size == 0:
+        return pool, np.array([], dtype=np.float32)
+
+    k = min(k, pool.size)
+    top = pool[np.argpartition(-sims[pool], k - 1)[:k]]
+    top = top[np.argsort(-sims[top], kind="stable")]
+    return top, sims[top]
+
+# full-table indexes below are in-memory only (not built in large-dataset mode)
+if tissue_cols and not LARGE_MODE:
+    register_artifact("profiles", "Expression similarity index", functools.partial(build_profile_index, STORE["tissues"].T))
+
+# -----------------------------------------------------------
+# HAIRPIN SKETCHES (MinHash + LSH banding over sequence k-mers)
+# near-identical / paralogous hairpins are grouped without all-pairs comparison
+# -----------------------------------------------------------
+HAIRPIN_KMER = 7
+HAIRPIN_NUM_PERM = 120
+HAIRPIN_LSH_BANDS = 40          # 3 rows per band -> candidate threshold ~0.3
+HAIRPIN_JACCARD = 0.5           # estimated k-mer Jaccard to call two hairpins near-identical
+_NO_KMERS = np.iinfo(np.uint32).max
+
+def _sequence_kmers(sequences, k):
+    """Encode every k-mer of every sequence as an int; returns (owner_row, kmer_code)."""
+    codes, lengths = sequence_codes(sequences)
+    if codes.size < k:
+        return np.array([], dtype=np.intp), np.array([], dtype=np.intp)
+
+    n_win = codes.size - k + 1
+    bad = codes == 255
+    kmers = np.zeros(n_win, dtype=np.intp)
+    bad_win = np.zeros(n_win, dtype=bool)
+    for j in range(k):
+        kmers = kmers * 4 + (codes[j:j + n_win] & 3)
+        bad_win |= bad[j:j + n_win]
+
+    owner = np.repeat(np.arange(len(lengths)), lengths)[:n_win]
+    ends = np.cumsum(lengths)
+    ok = (np.arange(n_win) + k <= ends[owner]) & ~bad_win
+    return owner[ok], kmers[ok]
+
+def minhash_signatures(sequences, k=HAIRPIN_KMER, num_perm=HAIRPIN_NUM_PERM, seed=1):
+    """(n_rows, num_perm) MinHash signatures; rows without k-mers get the _NO_KMERS sentinel.
+
+    The k-mer vocabulary (4**k) is small, so each hash is an explicit random
+    permutation of it and a signature entry is the minimum permuted rank.
+    """
+    owner, kmers = _sequence_kmers(sequences, k)
+    sig = np.full((len(sequences), num_perm), _NO_KMERS, dtype=np.uint32)
+    if kmers.size == 0:
+        return sig
+
+    rng = np.random.default_rng(seed)
+    rank_dtype = np.uint16 if 4 ** k <= 1 << 16 else np.uint32
+    perms = np.stack([rng.permutation(4 ** k) for _ in range(num_perm)]).astype(rank_dtype)
+
+    seg_starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+    rows = owner[seg_starts]
+    sig_t = np.empty((num_perm, rows.size), dtype=np.uint32)
+    for p in range(num_perm):
+        sig_t[p] = np.minimum.reduceat(np.take(perms[p], kmers), seg_starts)
+    sig[rows] = sig_t.T
+    return sig
+
+def _lsh_candidate_pairs(sig, bands, k=HAIRPIN_KMER):
+    """Pairs of rows sharing at least one LSH band bucket (head + neighbour edges per bucket)."""
+    r = sig.shape[1] // bands
+    bits = 2 * k
+    assert r * bits <= 64, "band too wide to pack into one uint64 key"
+
+    rows = np.flatnonzero(sig[:, 0] != _NO_KMERS)
+    n = rows.size
+    cols = np.ascontiguousarray(sig[rows].T).astype(np.uint64)
+    pairs = []
+    for band in range(bands):
+        key = np.zeros(n, dtype=np.uint64)
+        for col in range(band * r, (band + 1) * r):
+            key = (key << np.uint64(bits)) | cols[col]
+        order = np.argsort(key, kind="stable")
+        sk = key[order]
+        same_prev = np.r_[False, sk[1:] == sk[:-1]]
+        if not same_prev.any():
+            continue
+        head_idx = np.maximum.accumulate(np.where(~same_prev, np.arange(n), 0))
+        members = np.flatnonzero(same_prev)
+        # rows[] is increasing and the sort is stable, so earlier members have smaller row ids
+        for left in (order[members - 1], order[head_idx[members]]):
+            pairs.append(rows[left].astype(np.int64) * len(sig) + rows[order[members]])
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    codes = np.unique(np.concatenate(pairs))
+    return np.stack([codes // len(sig), codes % len(sig)], axis=1)
+
+def _connected_labels(n, edges):
+    """Label = smallest row position in each connected component."""
+    labels = np.arange(n)
+    if len(edges) == 0:
+        return labels
+    i, j = edges[:, 0], edges[:, 1]
+    while True:
+        m = np.minimum(labels[i], labels[j])
+        new = labels.copy()
+        np.minimum.at(new, i, m)
+        np.minimum.at(new, j, m)
+        new = new[new]
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+def build_hairpin_groups(sequences, threshold=HAIRPIN_JACCARD):
+    """Group rows whose hairpins are near-identical; returns (group_label, group_size)."""
+    sequences = list(sequences)
+    sig = minhash_signatures(sequences)
+    pairs = _lsh_candidate_pairs(sig, HAIRPIN_LSH_BANDS)
+    if len(pairs):
+        est = (sig[pairs[:, 0]] == sig[pairs[:, 1]]).mean(axis=1)
+        pairs = pairs[est >= threshold]
+    labels = _connected_labels(len(sequences), pairs)
+    sizes = np.bincount(labels, minlength=len(sequences))[labels]
+    return read_only((labels, sizes))
+
+if not LARGE_MODE:
+    register_artifact("hairpins", "Hairpin groups", functools.partial(build_hairpin_groups, df["sequence"]))
+
+# -----------------------------------------------------------
+# FAMILY INDEX (family -> member rows per database, with per-family aggregates)
+# members of a family are contiguous in `members`, so a family is one slice
+# -----------------------------------------------------------
+FAMILY_SOURCES = {"miRBase": "miRBase_family_display", "MirGeneDB": "MirGeneDB_family_display"}
+
+def family_aggregates(store, names, members, starts, counts):
+    """One row per family: size, fraction passing each criterion, species / tissues of any or all members."""
+    dims, levels, codes = store["dims"], store["levels"], store["codes"]
+    out = {"Family": names, "Members": counts}
+    for dim in ("Conservation", "Expression", "Structure"):
+        passed = codes[dims.index(dim)][members] == levels[dim].index("TRUE")
+        out[f"{dim} PASSED"] = np.add.reduceat(passed, starts) / counts
+
+    found = store["species"][:, members] != 2
+    species = np.array([animal_sidebar_names[c] for c in animal_cols], dtype=object)
+    for label, reduce in (("any", np.logical_or), ("all", np.logical_and)):
+        per_family = reduce.reduceat(found, starts, axis=1).T
+        out[f"Species found ({label})"] = [", ".join(species[row]) for row in per_family]
+
+    expressed = store["tissues"][:, members] >= 1.5
+    out["Tissues expressed (any)"] = np.logical_or.reduceat(expressed, starts, axis=1).sum(axis=0)
+    out["Tissues expressed (all)"] = np.logical_and.reduceat(expressed, starts, axis=1).sum(axis=0)
+    return pd.DataFrame(out)
+
+def build_family_index(data, store):
+    """Per database: family code of every row (-1 = single miRNA), member rows grouped by family, aggregates."""
+    index = {}
+    for db, col in FAMILY_SOURCES.items():
+        codes, names = pd.factorize(data[col], sort=True)
+        members = np.argsort(codes, kind="stable")
+        members = members[codes[members] >= 0]
+        counts = np.bincount(codes[members], minlength=len(names))
+        starts = np.r_[0, np.cumsum(counts)[:-1]]
+        index[db] = {
+            "codes": codes,
+            "members": members,
+            "starts": starts,
+            "counts": counts,
+            "aggregates": family_aggregates(store, np.asarray(names, dtype=object), members, starts, counts),
+        }
+    return read_only(index)
+
+def update_family_index(family_index, diff, data, store):
+    """Family index of `data` from the previous version's; only families with changed members are aggregated again.
+
+    None if a family appeared or disappeared (the family codes change).
+    """
+    reuse = diff["reuse"]
+    kept = np.flatnonzero(reuse >= 0)
+    changed = np.flatnonzero(reuse < 0)
+    index = {}
+    for db, col in FAMILY_SOURCES.items():
+        old = family_index[db]
+        names = old["aggregates"]["Family"]
+        fresh = data[col].iloc[changed]
+        c = pd.Index(names).get_indexer(fresh)
+        if ((c < 0) & fresh.notna().to_numpy()).any():
+            return None         # a family never seen before
+        codes = np.empty(len(data), dtype=old["codes"].dtype)
+        codes[kept] = old["codes"][reuse[kept]]
+        codes[changed] = c
+        members = np.argsort(codes, kind="stable")
+        members = members[codes[members] >= 0]
+        counts = np.bincount(codes[members], minlength=len(names))
+        if (counts == 0).any():
+            return None         # a family is gone from the table
+        starts = np.r_[0, np.cumsum(counts)[:-1]]
+
+        aggregates = old["aggregates"].copy()
+        touched = np.unique(np.r_[c, old["codes"][diff["dropped"]]])
+        touched = touched[touched >= 0]
+        if touched.size:
+            sub = np.concatenate([members[starts[f]:starts[f] + counts[f]] for f in touched])
+            fresh_aggregates = family_aggregates(
+                store, names.to_numpy()[touched], sub, np.r_[0, np.cumsum(counts[touched])[:-1]], counts[touched],
+            )
+            for name in aggregates.columns:
+                aggregates.loc[aggregates.index[touched], name] = fresh_aggregates[name].to_numpy()
+        index[db] = {"codes": codes, "members": members, "starts": starts, "counts": counts, "aggregates": aggregates}
+    return read_only(index)
+
+def expand_to_families(ids, family_index, db):
+    """`ids` plus every member of the `db` families they touch (single miRNAs stay as they are)."""
+    fam = family_index[db]
+    hit = np.unique(fam["codes"][ids])
+    hit = hit[hit >= 0]
+    if not hit.size:
+        return ids
+    members = np.concatenate([fam["members"][fam["starts"][f]:fam["starts"][f] + fam["counts"][f]] for f in hit])
+    return np.union1d(ids, members)
+
+if not LARGE_MODE:
+    register_artifact(
+        "families", "Family index", functools.partial(build_family_index, df, STORE),
+        update=functools.partial(update_family_index, data=df, store=STORE),
+    )
+
+# -----------------------------------------------------------
+# COUNT CUBE (pre-aggregated counts over the discrete filter dimensions)
+# summaries for filters expressible on these dims never touch row data;
+# anything else falls back to bitmap popcounts
+# -----------------------------------------------------------
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def popcount(bits):
+    return _POPCOUNT8[bits].sum(axis=-1, dtype=np.int64)
+
+def level_bitmaps(dims, levels, codes):
+    return {
+        name: np.packbits(codes[j][None, :] == np.arange(len(levels[name]))[:, None], axis=1)
+        for j, name in enumerate(dims)
+    }
+
+def build_count_cube(store):
+    """Dense count cube + per-level row bitmaps; the last level of every dim is OTHER/NA."""
+    dims, levels, codes = store["dims"], store["levels"], store["codes"]
+    shape = tuple(len(levels[name]) for name in dims)
+    flat = np.ravel_multi_index(tuple(codes), shape) if store["n"] else np.array([], dtype=np.int64)
+    cube = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape).astype(np.int32)
+    bitmaps = level_bitmaps(dims, levels, codes)
+    return read_only({"dims": list(dims), "levels": levels, "cube": cube, "bitmaps": bitmaps, "n": store["n"]})
+
+def update_count_cube(cube_index, diff, store):
+    """Count cube of `store` from the previous version's: the cells of the changed rows are counted again.
+
+    The bitmaps are patched in place when no row moved (nothing added or removed), else rebuilt.
+    """
+    dims, levels, codes = store["dims"], store["levels"], store["codes"]
+    reuse = diff["reuse"]
+    kept = np.flatnonzero(reuse >= 0)
+    changed = np.flatnonzero(reuse < 0)
+    shape = cube_index["cube"].shape
+    cube = cube_index["cube"].copy()
+    np.subtract.at(cube.reshape(-1), np.ravel_multi_index(tuple(diff["dropped_codes"]), shape), 1)
+    np.add.at(cube.reshape(-1), np.ravel_multi_index(tuple(codes[:, changed]), shape), 1)
+
+    if store["n"] == cube_index["n"] and (reuse[kept] == kept).all():
+        byte, bit = changed >> 3, (0x80 >> (changed & 7)).astype(np.uint8)
+        bitmaps = {}
+        for j, name in enumerate(dims):
+            bits = cube_index["bitmaps"][name].copy()
+            for level in range(len(levels[name])):
+                np.bitwise_and.at(bits[level], byte, ~bit)
+                on = codes[j][changed] == level
+                np.bitwise_or.at(bits[level], byte[on], bit[on])
+            bitmaps[name] = bits
+    else:
+        bitmaps = level_bitmaps(dims, levels, codes)
+    return read_only({"dims": list(dims), "levels": levels, "cube": cube, "bitmaps": bitmaps, "n": store["n"]})
+
+register_artifact(
+    "count_cube", "Count cube", functools.partial(build_count_cube, STORE),
+    update=functools.partial(update_count_cube, store=STORE),
 )
 
+PASS_LEVEL = {"PASSED": "TRUE", "NOT PASSED": "FALSE"}
+HSA_LEVEL = {"Only hsa-specific": "YES", "Not hsa-specific": "NO"}
+DB_LEVEL = {"In both": "both", "Only in miRBase": "only_mirbase"}
+
+# family option -> (cube dim, flag level)
+FAMILY_LEVEL = {
+    "Single miRNAs – miRBase": ("miRBase_family", "NO"),
+    "miRNAs in family – miRBase": ("miRBase_family", "YES"),
+    "Single miRNAs – MirGeneDB": ("MirGeneDB_family", "NO"),
+    "miRNAs in family – MirGeneDB": ("MirGeneDB_family", "YES"),
+}
+
+def spec_on_cube(spec) -> bool:
+    """True if every active filter in `spec` is a cube dimension."""
+    return not (
+        spec.get("search")
+        or spec.get("expand_families")
+        or species_filter_active(spec)
+        or spec.get("tissues_pos") or spec.get("tissues_neg")
+        or spec.get("seq_ranges")
+    )
+
+def cube_selection(cube_index, spec):
+    """Boolean mask over the cube cells selected by `spec`, or None if not expressible."""
+    if not spec_on_cube(spec):
+        return None
+
+    dims, levels = cube_index["dims"], cube_index["levels"]
+    sel = np.ones(cube_index["cube"].shape, dtype=bool)
+
+    def along(dim, allowed):
+        shape = [1] * len(dims)
+        shape[dims.index(dim)] = len(levels[dim])
+        return np.array([lv in allowed for lv in levels[dim]]).reshape(shape)
+
+    for dim, key in (("Conservation", "conservation"), ("Expression", "expression"), ("Structure", "structure")):
+        if spec.get(key) in PASS_LEVEL:
+            sel &= along(dim, {PASS_LEVEL[spec[key]]})
+    if spec.get("hsa") in HSA_LEVEL:
+        sel &= along("hsa", {HSA_LEVEL[spec["hsa"]]})
+    if spec.get("db") in DB_LEVEL:
+        sel &= along("db", {DB_LEVEL[spec["db"]]})
+    if spec.get("classes"):
+        sel &= along("Class_miRBase", set(spec["classes"]))
+    if spec.get("repeats"):
+        sel &= along("Repeat_Class", set(spec["repeats"]))
+
+    # family options are OR-ed across the two databases
+    if spec.get("family"):
+        fam = np.zeros(sel.shape, dtype=bool)
+        for option in spec["family"]:
+            if option in FAMILY_LEVEL:
+                dim, level = FAMILY_LEVEL[option]
+                fam = fam | along(dim, {level})
+        sel &= fam
+
+    return sel
+
+def summary_counts(cube_index, spec, row_mask, by):
+    """Row counts per level of cube dimension `by` for the current selection.
+
+    Answered from the cube when `spec` is expressible on it; with spec None
+    (or a spec the cube cannot answer) the rows of `row_mask` are counted.
+    """
+    sel = None if spec is None else cube_selection(cube_index, spec)
+    if sel is not None:
+        axis = cube_index["dims"].index(by)
+        others = tuple(i for i in range(sel.ndim) if i != axis)
+        counts = np.where(sel, cube_index["cube"], 0).sum(axis=others)
+    else:
+        counts = popcount(cube_index["bitmaps"][by] & np.packbits(row_mask))
+    levels = cube_index["levels"][by]
+    return pd.Series(counts[:-1], index=levels[:-1], name="Count")
+
 # -----------------------------------------------------------
-# SIDEBAR: FILTERS (always visible)
+# SPECIES PATTERNS (conservation profile of a row packed into one integer)
+# 2 bits per species in animal_cols order (primates -> fish); species filters
+# are evaluated once per distinct pattern with bit operations, then mapped to rows
 # -----------------------------------------------------------
-st.sidebar.header("Filters")
+SPECIES_MATCH = ["All of them", "Exactly these", "At least k of them"]
+
+def popcount16(bits):
+    return _POPCOUNT8[bits & 0xFF] + _POPCOUNT8[bits >> 8]
+
+@st.cache_resource(max_entries=RELEASE_CACHE_SIZE)
+def build_species_patterns(_store, version):
+    """Histogram of the packed species patterns, with per-pattern bitsets (bit i = animal_cols[i])."""
+    species = _store["species"]
+    packed = np.zeros(_store["n"], dtype=np.uint32)
+    for i in range(len(species)):
+        packed |= species[i].astype(np.uint32) << np.uint32(2 * i)
+    patterns, row_pattern, counts = np.unique(packed, return_inverse=True, return_counts=True)
+
+    found = np.zeros(len(patterns), dtype=np.uint16)
+    stable = np.zeros(len(patterns), dtype=np.uint16)
+    unstable = np.zeros(len(patterns), dtype=np.uint16)
+    depth = np.full(len(patterns), -1, dtype=np.int8)      # most distant species found
+    for i in range(len(species)):
+        state = (patterns >> np.uint32(2 * i)) & np.uint32(3)
+        bit = np.uint16(1 << i)
+        found[state != 2] |= bit
+        stable[state == 0] |= bit
+        unstable[state == 1] |= bit
+        depth[state != 2] = i
+
+    return read_only({
+        "patterns": patterns,
+        "counts": counts,
+        "row_pattern": row_pattern.astype(np.uint16 if len(patterns) <= 1 << 16 else np.int32),
+        "found": found,
+        "stable": stable,
+        "unstable": unstable,
+        "depth": depth,
+    })
+
+def species_bits(names):
+    return np.uint16(sum(1 << animal_cols.index(animal_sidebar_rev[n]) for n in names))
+
+def species_pattern_mask(patterns, spec):
+    """Boolean over the distinct patterns: which ones pass the species filters of `spec`."""
+    ok = np.ones(len(patterns["patterns"]), dtype=bool)
+    if spec.get("species_na"):
+        ok &= (patterns["found"] & species_bits(spec["species_na"])) == 0
+
+    if spec.get("species_found"):
+        sel = species_bits(spec["species_found"])
+        match = {"Stable (R/D)": patterns["stable"], "Unstable (S/I)": patterns["unstable"]}.get(
+            spec.get("stability"), patterns["found"]
+        )
+        mode = spec.get("species_match", SPECIES_MATCH[0])
+        if mode == "Exactly these":
+            ok &= (patterns["found"] == sel) & ((match & sel) == sel)
+        elif mode == "At least k of them":
+            ok &= popcount16(match & sel) >= min(spec.get("species_k", 1), len(spec["species_found"]))
+        else:
+            ok &= (match & sel) == sel
 
-search_term = st.sidebar.text_input("Search any column:", key="search_any")
+    if spec.get("depth", "Any") != "Any":
+        ok &= patterns["depth"] >= animal_cols.index(animal_sidebar_rev[spec["depth"]])
+    return ok
 
-pass_sb_options = ["Show all", "PASSED", "NOT PASSED"]
-conservation_choice = st.sidebar.selectbox("Conservation:", pass_sb_options, index=0, key="sb_conservation")
-expression_choice   = st.sidebar.selectbox("Expression:",   pass_sb_options, index=0, key="sb_expression")
-structure_choice    = st.sidebar.selectbox("Structure:",    pass_sb_options, index=0, key="sb_structure")
+def species_filter_active(spec) -> bool:
+    return bool(spec.get("species_found") or spec.get("species_na") or spec.get("depth", "Any") != "Any")
 
-hsa_sb_options = ["Show all", "Only hsa-specific", "Not hsa-specific"]
-hsa_choice = st.sidebar.selectbox("hsa specificity:", hsa_sb_options, index=0, key="sb_hsa")
+# -----------------------------------------------------------
+# SUMMARY ARRAYS (per-row aggregates behind the optional charts)
+# -----------------------------------------------------------
+SPECIES_STATES = ["Stable structure", "Unstable structure", "Not found"]
+
+def build_summary_arrays(store, system_slices):
+    """Species state bitmaps, tissue breadth and per-system expressed-tissue counts."""
+    n = store["n"]
+    species_bits = np.packbits(store["species"][:, None, :] == np.arange(3)[None, :, None], axis=2)
+
+    tissues = store["tissues"]
+    breadth = np.zeros(n, dtype=np.int16)
+    system_count = np.zeros((n, len(system_slices)), dtype=np.int16)
+    for start in range(0, n, STORE_CHUNK_ROWS):
+        stop = min(start + STORE_CHUNK_ROWS, n)
+        expressed = np.asarray(tissues[:, start:stop]) >= 1.5      # NaN -> not expressed
+        breadth[start:stop] = expressed.sum(axis=0)
+        for j, cols in enumerate(system_slices):
+            if cols:
+                system_count[start:stop, j] = expressed[list(cols)].sum(axis=0)
+    system_any_bits = np.packbits((system_count > 0).T, axis=1)
+
+    return read_only({
+        "species_bits": species_bits,
+        "breadth": breadth,
+        "n_tissues": tissues.shape[0],
+        "system_count": system_count,
+        "system_any_bits": system_any_bits,
+    })
+
+register_artifact("summary_arrays", "Summary arrays", functools.partial(
+    build_summary_arrays,
+    STORE,
+    tuple(tuple(tissue_cols.index(t) for t in ts if t in tissue_cols) for ts in SYSTEM_TISSUES.values()),
+))
+lap("indexes")
 
-family_options = [
+# -----------------------------------------------------------
+# PRESETS + URL STATE
+# presets reproduce the README use cases in one click; the whole widget
+# state is mirrored into the query string, so every view is a shareable link
+# -----------------------------------------------------------
+PRESETS = {
+    # query value -> label + widget state
+    "cardio-mouse": {
+        "label": "Cardiovascular miRNAs conserved in mouse",
+        "state": {
+            "sb_conservation": "PASSED",
+            "sb_expression": "PASSED",
+            "sb_structure": "PASSED",
+            "show_adv": True,
+            "cons_species_found": ["M. musculus"],
+            "show_species_cols": ["M. musculus"],
+            "tree_pos_1. Cardiorespiratory system": ["heart", "ventricle", "artery", "vein"],
+            "show_tissue_systems": ["Cardiorespiratory"],
+        },
+    },
+    "brain-primates": {
+        "label": "Brain miRNAs conserved in primates",
+        "state": {
+            "sb_conservation": "PASSED",
+            "sb_expression": "PASSED",
+            "sb_structure": "PASSED",
+            "show_adv": True,
+            "cons_species_found": ["P. troglodytes", "P. paniscus"],
+            "show_species_cols": ["P. troglodytes", "P. paniscus"],
+            "tree_pos_3. Neuro-Endocrine system": ["brain", "cortex", "cerebellum", "hippocampus"],
+            "show_tissue_systems": ["Neuro-Endocrine"],
+        },
+    },
+}
+
+# widget key -> (query parameter, default); list widgets use repeated parameters
+URL_STATE = {
+    "search_any": ("q", ""),
+    "sb_conservation": ("conservation", "Show all"),
+    "sb_expression": ("expression", "Show all"),
+    "sb_structure": ("structure", "Show all"),
+    "sb_hsa": ("hsa", "Show all"),
+    "ms_family": ("family", []),
+    "ms_repeat": ("repeat", []),
+    "show_repeat_plot": ("plot_repeat", False),
+    "show_species_plot": ("plot_species", False),
+    "show_breadth_plot": ("plot_breadth", False),
+    "show_system_plot": ("plot_system", False),
+    "group_hairpins": ("group", False),
+    "table_mode": ("table", "html"),
+    "fasta_one_per_group": ("fasta_one", False),
+    "show_adv": ("adv", False),
+    "batch_adv": ("batch", False),
+    "show_species_cols": ("species_cols", []),
+    "cons_species_found": ("found", []),
+    "cons_species_na": ("not_found", []),
+    "cons_stability_choice": ("stability", "All"),
+    "cons_species_match": ("match", "All of them"),
+    "cons_species_k": ("min_found", 1),
+    "cons_depth": ("depth", "Any"),
+    "show_tissue_systems": ("tissue_cols", []),
+    "show_class_cols": ("class_cols", False),
+    "db_filter": ("db", "Show all"),
+    "class_filter": ("class", []),
+    "show_seq_features": ("seq_cols", []),
+    "seq_filter": ("seq_filter", []),
+    "seq_sort": ("sort", "Table order"),
+    "seq_sort_desc": ("sort_desc", False),
+    "expand_families": ("expand", None),
+    "nn_query": ("nn", None),
+    "nn_k": ("nn_k", 10),
+    "nn_metric": ("nn_metric", "Cosine"),
+    "nn_log": ("nn_log", False),
+    "nn_restrict": ("nn_restrict", False),
+    "page": ("page", 1),
+}
+# tissue trees (one widget per system) travel as flat tissue lists
+URL_TREES = {"tree_pos_": "expressed", "tree_neg_": "not_expressed"}
+# sequence feature ranges travel as repeated "feature:min:max" values
+URL_RANGES = "seq_range"
+ADVANCED_KEYS = {
+    "show_species_cols", "cons_species_found", "cons_species_na", "cons_stability_choice",
+    "cons_species_match", "cons_species_k", "cons_depth",
+    "show_tissue_systems", "show_class_cols", "db_filter", "class_filter", "batch_adv",
+    "show_seq_features", "seq_filter", "seq_sort", "seq_sort_desc",
+}
+
+# options of the choice widgets that do not depend on the table
+PASS_OPTIONS = ["Show all", "PASSED", "NOT PASSED"]
+HSA_OPTIONS = ["Show all", "Only hsa-specific", "Not hsa-specific"]
+FAMILY_OPTIONS = [
     "Single miRNAs – miRBase",
     "Single miRNAs – MirGeneDB",
     "miRNAs in family – miRBase",
     "miRNAs in family – MirGeneDB",
 ]
-family_selected = st.sidebar.multiselect("Family:", family_options, default=[], key="ms_family")
+STABILITY_OPTIONS = ["All", "Stable (R/D)", "Unstable (S/I)"]
+DB_OPTIONS = ["Show all", "In both", "Only in miRBase"]
+TABLE_MODES = {"html": "Styled", "grid": "Grid"}
+NN_MAX_K = 50
+
+def widget_options():
+    """Widget key -> options its selectbox / radio / multiselect offers for the current table."""
+    species = list(animal_sidebar_names.values())
+    bounds = STORE["sequence_bounds"]
+    options = {
+        "sb_conservation": PASS_OPTIONS,
+        "sb_expression": PASS_OPTIONS,
+        "sb_structure": PASS_OPTIONS,
+        "sb_hsa": HSA_OPTIONS,
+        "ms_family": FAMILY_OPTIONS,
+        "ms_repeat": STORE["levels"]["Repeat_Class"][:-1],
+        "table_mode": list(TABLE_MODES),
+        "show_species_cols": species,
+        "cons_species_found": species,
+        "cons_species_na": species,
+        "cons_stability_choice": STABILITY_OPTIONS,
+        "cons_species_match": SPECIES_MATCH,
+        "cons_depth": ["Any"] + species,
+        "show_tissue_systems": [system_display_name(k) for k in SYSTEM_TISSUES],
+        "db_filter": DB_OPTIONS,
+        "class_filter": STORE["levels"]["Class_miRBase"][:-1],
+        "show_seq_features": SEQUENCE_FEATURE_NAMES,
+        "seq_filter": [name for name in SEQUENCE_FEATURE_NAMES if bounds[name][0] < bounds[name][1]],
+        "seq_sort": ["Table order"] + SEQUENCE_FEATURE_NAMES,
+        "expand_families": list(FAMILY_SOURCES),
+        "nn_metric": NN_METRICS,
+    }
+    for system, system_tissues in SYSTEM_TISSUES.items():
+        available = [t for t in system_tissues if t in tissue_sidebar_names]
+        for prefix in URL_TREES:
+            options[prefix + system] = available
+    return options
+
+# slider / number input key -> (min, max); None = no upper bound here
+WIDGET_RANGES = {
+    "cons_species_k": (1, len(animal_cols)),
+    "nn_k": (1, NN_MAX_K),
+    "page": (1, None),
+}
+
+def valid_state(state):
+    """`state` without the values no widget offers, and with numbers clamped to the widget ranges.
+
+    An invalid choice is left out (its widget falls back to the default), an
+    invalid item of a list is dropped; keys without a choice widget pass unchanged.
+    """
+    options = widget_options()
+    clean = {}
+    for key, value in state.items():
+        if key in options:
+            allowed = set(options[key])
+            if isinstance(value, (list, tuple)):
+                value = [v for v in value if v in allowed]
+            elif value is not None and value not in allowed:
+                continue
+        elif key in WIDGET_RANGES:
+            lo, hi = WIDGET_RANGES[key]
+            value = max(lo, int(value)) if hi is None else min(max(lo, int(value)), hi)
+        clean[key] = value
+    return clean
+
+def state_from_query(params):
+    """Widget state encoded in the query string (`params` is st.query_params)."""
+    state = {}
+    if params.get("preset") in PRESETS:
+        state.update(PRESETS[params["preset"]]["state"])
+
+    for key, (name, default) in URL_STATE.items():
+        if name not in params:
+            continue
+        if isinstance(default, list):
+            state[key] = params.get_all(name)
+        elif isinstance(default, bool):
+            state[key] = params[name].lower() in ("1", "true", "yes")
+        elif isinstance(default, int):
+            try:
+                state[key] = int(params[name])
+            except ValueError:
+                pass
+        else:
+            state[key] = params[name]
+
+    for prefix, name in URL_TREES.items():
+        tissues = set(params.get_all(name))
+        for system, system_tissues in SYSTEM_TISSUES.items():
+            picked = [t for t in system_tissues if t in tissues]
+            if picked:
+                state[prefix + system] = picked
+
+    for value in params.get_all(URL_RANGES):
+        name, _, bounds = value.partition(":")
+        lo, _, hi = bounds.partition(":")
+        if name not in SEQUENCE_FEATURES:
+            continue
+        cast = float if SEQUENCE_FEATURES[name][1] else int
+        try:
+            state[f"seq_range_{name}"] = (cast(float(lo)), cast(float(hi)))
+        except ValueError:
+            pass
+    return state
+
+def state_to_query(state):
+    """Query parameters for a widget state; defaults are left out."""
+    adv = bool(state.get("show_adv", False))
+    params = {}
+    for key, (name, default) in URL_STATE.items():
+        value = state.get(key, default)
+        if value is None or value == default or (key in ADVANCED_KEYS and not adv):
+            continue
+        if isinstance(value, list):
+            params[name] = [str(v) for v in value]
+        elif isinstance(value, bool):
+            params[name] = "1"
+        else:
+            params[name] = str(value)
+
+    if adv:
+        for prefix, name in URL_TREES.items():
+            tissues = [t for system in SYSTEM_TISSUES for t in state.get(prefix + system, [])]
+            if tissues:
+                params[name] = tissues
+        ranges = sequence_ranges(state)
+        if ranges:
+            params[URL_RANGES] = [f"{name}:{lo}:{hi}" for name, (lo, hi) in ranges.items()]
+    return params
+
+def apply_preset(name):
+    for k in FILTER_KEYS:
+        st.session_state.pop(k, None)
+    st.session_state.update(PRESETS[name]["state"])
+
+# first run of a session: restore the state of a shared link (or ?preset=...)
+if "_url_state_loaded" not in st.session_state:
+    st.session_state["_url_state_loaded"] = True
+    st.session_state.update(valid_state(state_from_query(st.query_params)))
+
+st.sidebar.markdown("<div class='sidebar-section-title'>Presets</div>", unsafe_allow_html=True)
+for preset_name, preset in PRESETS.items():
+    st.sidebar.button(
+        preset["label"],
+        key=f"preset_{preset_name}",
+        on_click=apply_preset,
+        args=(preset_name,),
+        use_container_width=True,
+    )
+st.sidebar.caption("The page address encodes the current filters: copy it to share this view.")
+
+# -----------------------------------------------------------
+# FILTER SPEC (canonical description of the active filters)
+# -----------------------------------------------------------
+def sequence_ranges(state):
+    """Feature -> [min, max] of every sequence range of `state` narrower than the table's own range."""
+    if not state.get("show_adv", False):
+        return {}
+    ranges = {}
+    for name in state.get("seq_filter", []):
+        bounds = STORE["sequence_bounds"].get(name)
+        value = state.get(f"seq_range_{name}")
+        if bounds is None or value is None:
+            continue
+        lo, hi = max(min(value), bounds[0]), min(max(value), bounds[1])
+        if [lo, hi] != bounds:
+            ranges[name] = [lo, hi]
+    return ranges
+
+def sort_from_state(state):
+    """(sequence feature, descending) the result rows are ordered by, or None for the table order."""
+    name = state.get("seq_sort", "Table order") if state.get("show_adv", False) else None
+    if name not in SEQUENCE_FEATURES:
+        return None
+    return (name, bool(state.get("seq_sort_desc", False)))
+
+def filter_spec_from_state(state):
+    """Filter spec of a widget state (session state or a preset), derived as the sidebar does."""
+    adv = bool(state.get("show_adv", False))
+
+    def advanced(key, default):
+        return state.get(key, default) if adv else default
+
+    species_found = list(advanced("cons_species_found", []))
+    return {
+        "search": state.get("search_any", "") or "",
+        "conservation": state.get("sb_conservation", "Show all"),
+        "expression": state.get("sb_expression", "Show all"),
+        "structure": state.get("sb_structure", "Show all"),
+        "hsa": state.get("sb_hsa", "Show all"),
+        "family": list(state.get("ms_family", [])),
+        "repeats": list(state.get("ms_repeat", [])),
+        "db": advanced("db_filter", "Show all"),
+        "classes": list(advanced("class_filter", [])),
+        "species_found": species_found,
+        "species_na": list(advanced("cons_species_na", [])),
+        "stability": advanced("cons_stability_choice", "All") if species_found else "All",
+        "species_match": advanced("cons_species_match", SPECIES_MATCH[0]) if species_found else SPECIES_MATCH[0],
+        "species_k": (
+            int(advanced("cons_species_k", 1))
+            if species_found and advanced("cons_species_match", SPECIES_MATCH[0]) == "At least k of them" else 1
+        ),
+        "depth": advanced("cons_depth", "Any"),
+        "tissues_pos": sorted({t for k in SYSTEM_TISSUES for t in advanced(f"tree_pos_{k}", [])}),
+        "tissues_neg": sorted({t for k in SYSTEM_TISSUES for t in advanced(f"tree_neg_{k}", [])}),
+        "seq_ranges": sequence_ranges(state),
+        "expand_families": state.get("expand_families"),
+    }
+
+def table_view_from_state(state, page=None):
+    """Columns and layout of the web table for a widget state (key of the rendered table)."""
+    adv = bool(state.get("show_adv", False))
+    systems = set(state.get("show_tissue_systems", [])) if adv else set()
+    return {
+        "species": [animal_sidebar_rev[x] for x in state.get("show_species_cols", [])] if adv else [],
+        "tissues": sorted({
+            t for k, ts in SYSTEM_TISSUES.items() if system_display_name(k) in systems
+            for t in ts if t in tissue_sidebar_names
+        }),
+        "class_cols": bool(state.get("show_class_cols", False)) if adv else False,
+        "seq_features": [f for f in SEQUENCE_FEATURES if f in state.get("show_seq_features", [])] if adv else [],
+        "sort": sort_from_state(state),
+        "group_hairpins": bool(state.get("group_hairpins", False)) and "hairpins" in ARTIFACTS,
+        "grid": state.get("table_mode", "html") == "grid",
+        "page": page,
+    }
+
+# -----------------------------------------------------------
+# QUERY CACHE (process-wide, shared by every session)
+# canonical filter spec -> result row ids and rendered table / exports;
+# bounded in bytes with least-recently-used eviction, and an entry built
+# for an older version of the dataset is dropped when looked up
+# -----------------------------------------------------------
+QUERY_CACHE_BYTES = int(os.environ.get("MIRRF_QUERY_CACHE_MB", "256")) * 1024 * 1024
+
+@st.cache_resource
+def query_cache():
+    return {
+        "entries": OrderedDict(),   # key -> {"version", "value", "size"}, least recently used first
+        "bytes": 0,
+        "hits": 0,
+        "misses": 0,
+        "evictions": 0,
+        "lock": threading.Lock(),
+    }
+
+def canonical_spec(spec):
+    """JSON key of a filter spec; selection order of multiselects does not change the result."""
+    return json.dumps(
+        {k: sorted(v) if isinstance(v, (list, tuple, set)) else v for k, v in spec.items()},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+
+def _cached_size(value):
+    if isinstance(value, dict):
+        return sum(_cached_size(v) for v in value.values())
+    if hasattr(value, "nbytes"):     # numpy arrays, Arrow tables
+        return int(value.nbytes)
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    return 64
+
+def cache_get(cache, key, version):
+    with cache["lock"]:
+        entry = cache["entries"].get(key)
+        if entry is not None and entry["version"] != version:
+            del cache["entries"][key]
+            cache["bytes"] -= entry["size"]
+            entry = None
+        if entry is None:
+            cache["misses"] += 1
+            return None
+        cache["entries"].move_to_end(key)
+        cache["hits"] += 1
+        return entry["value"]
+
+def cache_put(cache, key, version, value):
+    size = _cached_size(value)
+    if size > QUERY_CACHE_BYTES:
+        return value
+    with cache["lock"]:
+        old = cache["entries"].pop(key, None)
+        if old is not None:
+            cache["bytes"] -= old["size"]
+        cache["entries"][key] = {"version": version, "value": value, "size": size}
+        cache["bytes"] += size
+        while cache["bytes"] > QUERY_CACHE_BYTES:
+            _, evicted = cache["entries"].popitem(last=False)
+            cache["bytes"] -= evicted["size"]
+            cache["evictions"] += 1
+    return value
+
+QUERY_CACHE = query_cache()
+# -----------------------------------------------------------
+# APPLY FILTERS (boolean masks over the column store)
+# -----------------------------------------------------------
+def filter_masks(store, spec):
+    """One boolean row mask per active filter group of `spec` (text search excluded)."""
+    dims, levels, codes = store["dims"], store["levels"], store["codes"]
+    masks = {}
+
+    def level_mask(dim, allowed):
+        lut = np.array([lv in allowed for lv in levels[dim]])
+        return lut[codes[dims.index(dim)]]
+
+    for dim, key in (("Conservation", "conservation"), ("Expression", "expression"), ("Structure", "structure")):
+        if spec.get(key) in PASS_LEVEL:
+            masks[key] = level_mask(dim, {PASS_LEVEL[spec[key]]})
+    if spec.get("hsa") in HSA_LEVEL:
+        masks["hsa"] = level_mask("hsa", {HSA_LEVEL[spec["hsa"]]})
+    if spec.get("db") in DB_LEVEL:
+        masks["db"] = level_mask("db", {DB_LEVEL[spec["db"]]})
+    if spec.get("classes"):
+        masks["classes"] = level_mask("Class_miRBase", set(spec["classes"]))
+
+    # family options are OR-ed across the two databases
+    if spec.get("family"):
+        fam = np.zeros(store["n"], dtype=bool)
+        for option in spec["family"]:
+            if option in FAMILY_LEVEL:
+                dim, level = FAMILY_LEVEL[option]
+                fam |= level_mask(dim, {level})
+        masks["family"] = fam
+
+    if spec.get("repeats"):
+        masks["repeats"] = level_mask("Repeat_Class", set(spec["repeats"]))
+
+    # species: one test per distinct conservation pattern (see SPECIES PATTERNS)
+    if species_filter_active(spec):
+        patterns = build_species_patterns(store, store["version"])
+        masks["species"] = species_pattern_mask(patterns, spec)[patterns["row_pattern"]]
+
+    # Expressed in: >= 1.5 / Not expressed in: < 1.5 (missing values match neither)
+    if spec.get("tissues_pos") or spec.get("tissues_neg"):
+        tissues = store["tissues"]
+        expr = np.ones(store["n"], dtype=bool)
+        for t in spec.get("tissues_pos") or []:
+            expr &= tissues[tissue_cols.index(t)] >= 1.5
+        for t in spec.get("tissues_neg") or []:
+            expr &= tissues[tissue_cols.index(t)] < 1.5
+        masks["tissues"] = expr
+
+    # hairpin sequence features: inclusive ranges on the values as shown (rows without a sequence match none)
+    if spec.get("seq_ranges"):
+        seq = np.ones(store["n"], dtype=bool)
+        for name, (lo, hi) in spec["seq_ranges"].items():
+            values = np.round(store["sequence"][SEQUENCE_FEATURE_NAMES.index(name)], SEQUENCE_FEATURES[name][1])
+            seq &= (values >= np.float32(lo)) & (values <= np.float32(hi))
+        masks["sequence"] = seq
+    return masks
+
+def filter_rows(store, spec):
+    """Sorted row ids passing every filter of `spec` except the text search."""
+    mask = np.ones(store["n"], dtype=bool)
+    for group_mask in filter_masks(store, spec).values():
+        mask &= group_mask
+    return np.flatnonzero(mask)
+
+def search_hits(term):
+    """Sorted ids of every row matching the text search (case-insensitive regex), cached per term."""
+    key = ("search", DATA_FILE, term)
+    hits = cache_get(QUERY_CACHE, key, DATA_VERSION)
+    if hits is None:
+        if LARGE_MODE:
+            hits = search_rows(STORE, term)
+        else:
+            # one column at a time, only over the rows not matched yet (no copy of the table)
+            pattern = search_pattern(term)
+            hit = np.zeros(len(df), dtype=bool)
+            for col in df.columns:
+                todo = np.flatnonzero(~hit)
+                if not len(todo):
+                    break
+                values = df[col].take(todo).astype(str)
+                hit[todo[values.str.contains(pattern, na=False).to_numpy()]] = True
+            hits = np.flatnonzero(hit)
+        hits.setflags(write=False)
+        cache_put(QUERY_CACHE, key, DATA_VERSION, hits)
+    return hits
+
+# -----------------------------------------------------------
+# FACET COUNTS (rows each sidebar option would leave, given the other filters)
+# every filter group is one row mask; an option of group g is counted over
+# the AND of all the other masks (prefix / suffix ANDs, so one sweep in total)
+# -----------------------------------------------------------
+def facet_counts(store, spec, search_ids=None):
+    """Group -> {option: row count} for every sidebar selectbox / multiselect."""
+    n = store["n"]
+    masks = filter_masks(store, spec)
+    if search_ids is not None:
+        masks["search"] = np.zeros(n, dtype=bool)
+        masks["search"][search_ids] = True
+
+    # others[g] = AND of every mask except g's own
+    names = list(masks)
+    prefix = [np.ones(n, dtype=bool)]
+    for name in names:
+        prefix.append(prefix[-1] & masks[name])
+    suffix = np.ones(n, dtype=bool)
+    others = {}
+    for i in range(len(names) - 1, -1, -1):
+        others[names[i]] = prefix[i] & suffix
+        suffix &= masks[names[i]]
+    current = prefix[-1]
+
+    def rest(group):
+        return others.get(group, current)
+
+    dims, levels, codes = store["dims"], store["levels"], store["codes"]
+
+    def level_counts(dim, group):
+        counts = np.bincount(codes[dims.index(dim)][rest(group)], minlength=len(levels[dim]))
+        return dict(zip(levels[dim], counts.tolist()))
+
+    facets = {}
+    for dim, group, level_of in (
+        ("Conservation", "conservation", PASS_LEVEL),
+        ("Expression", "expression", PASS_LEVEL),
+        ("Structure", "structure", PASS_LEVEL),
+        ("hsa", "hsa", HSA_LEVEL),
+        ("db", "db", DB_LEVEL),
+    ):
+        counts = level_counts(dim, group)
+        facets[group] = {"Show all": int(rest(group).sum())} | {opt: counts[lv] for opt, lv in level_of.items()}
+    facets["repeats"] = level_counts("Repeat_Class", "repeats")
+    facets["classes"] = level_counts("Class_miRBase", "classes")
+    by_dim = {dim: level_counts(dim, "family") for dim in {d for d, _ in FAMILY_LEVEL.values()}}
+    facets["family"] = {opt: by_dim[dim][lv] for opt, (dim, lv) in FAMILY_LEVEL.items()}
+
+    # species: the other filters give a histogram over the distinct patterns,
+    # each option is one pattern mask of the spec with that option applied
+    patterns = build_species_patterns(store, store["version"])
+    per_pattern = np.bincount(patterns["row_pattern"][rest("species")], minlength=len(patterns["patterns"]))
+
+    def species_count(**change):
+        return int(per_pattern[species_pattern_mask(patterns, spec | change)].sum())
+
+    species_names = [animal_sidebar_names[c] for c in animal_cols]
+    found, na = spec.get("species_found") or [], spec.get("species_na") or []
+    facets["species_found"] = {s: species_count(species_found=sorted(set(found) | {s})) for s in species_names}
+    facets["species_na"] = {s: species_count(species_na=sorted(set(na) | {s})) for s in species_names}
+    facets["stability"] = {s: species_count(stability=s) for s in ("All", "Stable (R/D)", "Unstable (S/I)")}
+    facets["depth"] = {d: species_count(depth=d) for d in ["Any"] + species_names}
+
+    # tissue lists are AND-ed: an option counts the current rows it would keep
+    rows = np.flatnonzero(current)
+    above = np.zeros(len(tissue_cols), dtype=np.int64)
+    below = np.zeros(len(tissue_cols), dtype=np.int64)
+    for first in range(0, len(rows), STORE_CHUNK_ROWS):
+        values = store["tissues"][:, rows[first:first + STORE_CHUNK_ROWS]]
+        above += (values >= 1.5).sum(axis=1)
+        below += (values < 1.5).sum(axis=1)
+    facets["tissues_pos"] = dict(zip(tissue_cols, above.tolist()))
+    facets["tissues_neg"] = dict(zip(tissue_cols, below.tolist()))
+    return facets
+
+def with_count(group):
+    """format_func labelling each option of `group` with its facet count."""
+    counts = FACETS.get(group, {})
+    return lambda option: f"{option} ({counts[option]:,})" if option in counts else str(option)
+
+# a widget discards a selection its options no longer offer (e.g. a repeat
+# class missing from the release just switched to): the filters are derived
+# from the same state the widgets will show, cleaned before they are drawn
+current_state = {k: st.session_state[k] for k in FILTER_KEYS if k in st.session_state}
+valid = valid_state(current_state)
+for key, value in current_state.items():
+    if key not in valid:
+        del st.session_state[key]
+    elif valid[key] != value:
+        st.session_state[key] = valid[key]
+
+filter_spec = filter_spec_from_state(st.session_state)
+spec_key = canonical_spec(filter_spec)
+
+FACETS = cache_get(QUERY_CACHE, ("facets", DATA_FILE, spec_key), DATA_VERSION)
+if FACETS is None:
+    FACETS = cache_put(
+        QUERY_CACHE, ("facets", DATA_FILE, spec_key), DATA_VERSION,
+        facet_counts(STORE, filter_spec, search_hits(filter_spec["search"]) if filter_spec["search"] else None),
+    )
+lap("facets")
+
+# -----------------------------------------------------------
+# SIDEBAR: FILTERS (always visible)
+# -----------------------------------------------------------
+search_term = st.sidebar.text_input("Search any column:", key="search_any")
+
+conservation_choice = st.sidebar.selectbox("Conservation:", PASS_OPTIONS, index=0, key="sb_conservation", format_func=with_count("conservation"))
+expression_choice   = st.sidebar.selectbox("Expression:",   PASS_OPTIONS, index=0, key="sb_expression", format_func=with_count("expression"))
+structure_choice    = st.sidebar.selectbox("Structure:",    PASS_OPTIONS, index=0, key="sb_structure", format_func=with_count("structure"))
+
+hsa_choice = st.sidebar.selectbox("hsa specificity:", HSA_OPTIONS, index=0, key="sb_hsa", format_func=with_count("hsa"))
+
+family_selected = st.sidebar.multiselect(
+    "Family:", FAMILY_OPTIONS, key="ms_family", format_func=with_count("family"),
+)
 
 repeats_selected = st.sidebar.multiselect(
     "Repeat class:",
-    sorted(df["Repeat_Class"].dropna().unique()) if "Repeat_Class" in df.columns else [],
-    default=[],
+    STORE["levels"]["Repeat_Class"][:-1],
     key="ms_repeat",
+    format_func=with_count("repeats"),
 )
 
 # Checkbox in SIDEBAR (subito sotto "Repeat class")
-st.sidebar.checkbox("Show repeat class distribution", value=False, key="show_repeat_plot")
+if "hairpins" in ARTIFACTS:
+    group_hairpins = st.sidebar.checkbox("Group near-identical hairpins", value=False, key="group_hairpins")
+else:
+    group_hairpins = False
+
+st.sidebar.radio(
+    "Table display:",
+    list(TABLE_MODES),
+    format_func=TABLE_MODES.get,
+    horizontal=True,
+    key="table_mode",
+    help="Styled: coloured HTML table. Grid: sortable table sent as compact Arrow data (faster on wide views).",
+)
 
 # -----------------------------------------------------------
 # SIDEBAR: ADVANCED OPTIONS
+# batched mode: the advanced widgets sit in a form inside a fragment, so
+# their changes stay in the browser until "Apply filters"; the app reruns
+# only when the submitted state differs from the applied one. Session state
+# (filters, any_filter_active, reset, URL) only ever holds applied values.
 # -----------------------------------------------------------
 st.sidebar.markdown("---")
 
-animals_to_show = []
-tissues_to_show = []
-tissues_filter = []
-tissues_not_filter = []
-show_class_cols = False
-species_na_sidebar = []
-species_found_sidebar = []
-stability_choice = "All"
-mirgene_filter = "Show all"
-classes_selected = []
+def advanced_state(state):
+    """Values of the advanced widgets, i.e. what a batched "Apply filters" can change."""
+    keys = (ADVANCED_KEYS - {"batch_adv"}) | {f"{prefix}{k}" for prefix in URL_TREES for k in SYSTEM_TISSUES}
+    keys |= {f"seq_range_{name}" for name in SEQUENCE_FEATURES}
+    return {k: state.get(k) for k in sorted(keys)}
 
-show_adv = st.sidebar.toggle("Advanced options", value=False, key="show_adv")
-
-if show_adv:
-    with st.sidebar.expander("Evolutionary conservation", expanded=True):
+def advanced_options(batched=False):
+    """Advanced filter and column widgets (drawn inside `with st.sidebar`)."""
+    with st.expander("Evolutionary conservation", expanded=True):
 
         st.markdown("<div class='sidebar-section-title'>Show extra columns</div>", unsafe_allow_html=True)
 
-        animals_to_show_sidebar = st.multiselect(
+        st.multiselect(
             "Show species columns:",
             list(animal_sidebar_names.values()),
-            default=[],
             key="show_species_cols",
         )
-        animals_to_show = [animal_sidebar_rev[x] for x in animals_to_show_sidebar]
 
         st.markdown("<hr class='subtle-hr'>", unsafe_allow_html=True)
         st.markdown("<div class='sidebar-section-title'>Filter extra columns</div>", unsafe_allow_html=True)
 
         species_options = list(animal_sidebar_names.values())
 
-        species_found_sidebar = st.multiselect(
+        species_found = st.multiselect(
             "Found in:",
             species_options,
-            default=[],
             key="cons_species_found",
+            format_func=with_count("species_found"),
         )
 
-        if species_found_sidebar:
-            stability_choice = st.selectbox(
+        # a form cannot react to "Found in" before it is applied: batched, the choice is always shown
+        if batched or species_found:
+            st.selectbox(
                 "Structure:",
-                ["All", "Stable (R/D)", "Unstable (S/I)"],
+                STABILITY_OPTIONS,
                 index=0,
                 key="cons_stability_choice",
+                format_func=with_count("stability"),
             )
-        else:
-            stability_choice = "All"
+            species_match = st.radio("Match:", SPECIES_MATCH, index=0, key="cons_species_match")
+            if batched or species_match == "At least k of them":
+                st.session_state.setdefault("cons_species_k", 1)   # default via state: the value may come from the URL
+                st.slider("k:", 1, len(species_options), key="cons_species_k")
 
-        species_na_sidebar = st.multiselect(
+        st.multiselect(
             "Not found in:",
             species_options,
-            default=[],
             key="cons_species_na",
+            format_func=with_count("species_na"),
         )
 
-    with st.sidebar.expander("Tissue expression", expanded=True):
+        st.selectbox(
+            "Conserved at least as far as:",
+            ["Any"] + species_options,
+            index=0,
+            key="cons_depth",
+            format_func=with_count("depth"),
+            help="Most distant species (primates → fish, in the column order) in which the pre-miRNA is found.",
+        )
+
+    with st.expander("Tissue expression", expanded=True):
 
         st.markdown("<div class='sidebar-section-title'>Show extra columns</div>", unsafe_allow_html=True)
 
         system_disp_list = [system_display_name(k) for k in SYSTEM_TISSUES.keys()]
-        chosen_systems_disp = st.multiselect(
+        st.multiselect(
             "Show tissue columns (by system):",
             system_disp_list,
-            default=[],
             key="show_tissue_systems",
         )
 
-        chosen_sys_keys = [k for k in SYSTEM_TISSUES.keys() if system_display_name(k) in set(chosen_systems_disp)]
-        tissues_to_show_set = set()
-        for k in chosen_sys_keys:
-            tissues_to_show_set.update([t for t in SYSTEM_TISSUES[k] if t in tissue_sidebar_names])
-        tissues_to_show = sorted(tissues_to_show_set)
-
         st.markdown("<hr class='subtle-hr'>", unsafe_allow_html=True)
         st.markdown("<div class='sidebar-section-title'>Filter extra columns</div>", unsafe_allow_html=True)
 
         with st.expander("Expressed in (select tissues by system):", expanded=False):
-            tissues_filter_set = set()
-
             for system_name, sys_tissues in SYSTEM_TISSUES.items():
                 available = [t for t in sys_tissues if t in tissue_sidebar_names]
                 if not available:
@@ -848,26 +2818,19 @@ if show_adv:
                 col_icon, col_exp = st.columns([1.6, 10], gap="small")
 
                 with col_icon:
-                    if icon is not None:
-                        st.markdown("<div class='sidebar-icon'>", unsafe_allow_html=True)
-                        st.image(icon, width=110)
-                        st.markdown("</div>", unsafe_allow_html=True)
+                    render_system_icon(icon)
 
                 with col_exp:
                     display_system = system_display_name(system_name)
                     with st.expander(display_system, expanded=False):
-                        picked = st.multiselect(
+                        st.multiselect(
                             "Select tissues",
                             available,
                             key=f"tree_pos_{system_name}",
+                            format_func=with_count("tissues_pos"),
                         )
-                        tissues_filter_set.update(picked)
-
-            tissues_filter = sorted(tissues_filter_set)
 
         with st.expander("Not expressed in (select tissues by system):", expanded=False):
-            tissues_not_filter_set = set()
-
             for system_name, sys_tissues in SYSTEM_TISSUES.items():
                 available = [t for t in sys_tissues if t in tissue_sidebar_names]
                 if not available:
@@ -877,28 +2840,23 @@ if show_adv:
                 col_icon, col_exp = st.columns([1.6, 10], gap="small")
 
                 with col_icon:
-                    if icon is not None:
-                        st.markdown("<div class='sidebar-icon'>", unsafe_allow_html=True)
-                        st.image(icon, width=110)
-                        st.markdown("</div>", unsafe_allow_html=True)
+                    render_system_icon(icon)
 
                 with col_exp:
                     display_system = system_display_name(system_name)
                     with st.expander(display_system, expanded=False):
-                        picked = st.multiselect(
+                        st.multiselect(
                             "Select tissues",
                             available,
                             key=f"tree_neg_{system_name}",
+                            format_func=with_count("tissues_neg"),
                         )
-                        tissues_not_filter_set.update(picked)
-
-            tissues_not_filter = sorted(tissues_not_filter_set)
 
-    with st.sidebar.expander("Database / Class", expanded=True):
+    with st.expander("Database / Class", expanded=True):
 
         st.markdown("<div class='sidebar-section-title'>Show extra columns</div>", unsafe_allow_html=True)
 
-        show_class_cols = st.checkbox(
+        st.checkbox(
             "Show Class columns",
             value=False,
             key="show_class_cols",
@@ -907,25 +2865,104 @@ if show_adv:
         st.markdown("<hr class='subtle-hr'>", unsafe_allow_html=True)
         st.markdown("<div class='sidebar-section-title'>Filter extra columns</div>", unsafe_allow_html=True)
 
-        mirgene_filter = st.selectbox(
+        st.selectbox(
             "Database:",
-            ["Show all", "In both", "Only in miRBase"],
+            DB_OPTIONS,
             key="db_filter",
+            format_func=with_count("db"),
         )
 
-        classes = sorted(df["Class_miRBase"].dropna().unique()) if "Class_miRBase" in df.columns else []
-        classes_selected = st.multiselect(
+        classes = STORE["levels"]["Class_miRBase"][:-1]
+        st.multiselect(
             "Class:",
             classes,
-            default=[],
             key="class_filter",
+            format_func=with_count("classes"),
         )
 
+    with st.expander("Hairpin sequence", expanded=True):
+
+        st.markdown("<div class='sidebar-section-title'>Show extra columns</div>", unsafe_allow_html=True)
+
+        st.multiselect(
+            "Show sequence features:",
+            SEQUENCE_FEATURE_NAMES,
+            key="show_seq_features",
+            format_func=sequence_feature_label,
+        )
+
+        st.markdown("<hr class='subtle-hr'>", unsafe_allow_html=True)
+        st.markdown("<div class='sidebar-section-title'>Filter extra columns</div>", unsafe_allow_html=True)
+
+        bounds = STORE["sequence_bounds"]
+        seq_filter = st.multiselect(
+            "Filter on:",
+            [name for name in SEQUENCE_FEATURE_NAMES if bounds[name][0] < bounds[name][1]],
+            key="seq_filter",
+            format_func=sequence_feature_label,
+            help="Low complexity: DUST score of the hairpin's triplets (repeats score high).",
+        )
+        # a form cannot react to "Filter on" before it is applied: batched, new sliders appear on "Apply"
+        for name in seq_filter:
+            sequence_range_slider(name)
+
+        st.markdown("<hr class='subtle-hr'>", unsafe_allow_html=True)
+        st.selectbox(
+            "Sort rows by:",
+            ["Table order"] + SEQUENCE_FEATURE_NAMES,
+            key="seq_sort",
+            format_func=sequence_feature_label,
+        )
+        st.checkbox("Descending", key="seq_sort_desc")
+
+def sequence_feature_label(name):
+    return SEQUENCE_FEATURES[name][0] if name in SEQUENCE_FEATURES else name
+
+def sequence_range_slider(name):
+    """Range slider of one sequence feature, over the feature's range in the current table."""
+    label, decimals = SEQUENCE_FEATURES[name]
+    lo, hi = STORE["sequence_bounds"][name]
+    key = f"seq_range_{name}"
+    value = st.session_state.get(key, (lo, hi))
+    # clipped to this table (the value may come from the URL or an older release)
+    st.session_state[key] = (min(max(min(value), lo), hi), max(min(max(value), hi), lo))
+    st.slider(
+        label,
+        lo, hi,
+        step=10 ** -decimals if decimals else 1,
+        format=f"%.{decimals}f" if decimals else "%d",
+        key=key,
+    )
+
+@partial_rerun
+def staged_advanced_options():
+    with st.form("adv_form", border=False):
+        advanced_options(batched=True)
+        submitted = st.form_submit_button("Apply filters", type="primary", use_container_width=True)
+    if submitted and advanced_state(st.session_state) != st.session_state.get("_applied_adv"):
+        st.rerun()
+
+show_adv = st.sidebar.toggle("Advanced options", key="show_adv")
+
+if show_adv:
+    batch_adv = st.sidebar.checkbox(
+        "Apply with one button",
+        key="batch_adv",
+        help="Stage several advanced selections and apply them together.",
+    )
+    st.session_state["_applied_adv"] = advanced_state(st.session_state)
+    with st.sidebar:
+        if batch_adv:
+            staged_advanced_options()
+        else:
+            advanced_options()
+
 # -----------------------------------------------------------
 # SIDEBAR: RESET BUTTON (only if at least one filter is active)
 # -----------------------------------------------------------
 st.sidebar.markdown("---")
-if any_filter_active():
+RESET_SHOWN = any_filter_active()
+if RESET_SHOWN:
     if st.sidebar.button("Reset all filters", use_container_width=True):
         for k in FILTER_KEYS:
             st.session_state.pop(k, None)
@@ -933,175 +2970,242 @@ if any_filter_active():
         st.rerun()
 
 # -----------------------------------------------------------
-# APPLY FILTERS
+# SIDEBAR: BACKGROUND WORK (readiness of the derived artifacts)
 # -----------------------------------------------------------
-filtered = df.copy()
+artifacts_pending = any(state in ("queued", "building") for state in artifact_states().values())
+
+@st.fragment(run_every=ARTIFACT_POLL_SECONDS if artifacts_pending else None)
+def artifact_panel():
+    """What the worker pool is still preparing; the page is redrawn once when everything is ready."""
+    states = artifact_states()
+    pending = [ARTIFACTS[name][0] for name, state in states.items() if state in ("queued", "building")]
+    if artifacts_pending and not pending:
+        st.rerun()          # panels that fell back can now show their artifact
+    if pending:
+        ready = sum(state == "ready" for state in states.values())
+        st.caption(f"Preparing in the background ({ready} of {len(states)} ready): {', '.join(pending)}.")
+    failed = [ARTIFACTS[name][0] for name, state in states.items() if state == "failed"]
+    if failed:
+        st.caption(f"Not available (could not be built): {', '.join(failed)}.")
+
+with st.sidebar:
+    artifact_panel()
+
+lap("sidebar")
+
+row_ids = cache_get(QUERY_CACHE, ("rows", DATA_FILE, spec_key), DATA_VERSION)
+if row_ids is None:
+    row_ids = filter_rows(STORE, filter_spec)
+    lap("filter")
+
+    # Search any column
+    if search_term:
+        row_ids = np.intersect1d(row_ids, search_hits(search_term), assume_unique=True)
+
+    if filter_spec["expand_families"] in FAMILY_SOURCES and "families" in ARTIFACTS:
+        row_ids = expand_to_families(row_ids, artifact("families", wait=True), filter_spec["expand_families"])
+
+    row_ids.setflags(write=False)     # shared with other sessions through the cache
+    cache_put(QUERY_CACHE, ("rows", DATA_FILE, spec_key), DATA_VERSION, row_ids)
+
+n_filtered = len(row_ids)
+
+def sort_rows(store, ids, sort):
+    """`ids` ordered by one sequence feature; ties keep the table order, rows without a sequence come last."""
+    name, descending = sort
+    values = store["sequence"][SEQUENCE_FEATURE_NAMES.index(name)][ids]
+    return ids[np.argsort(-values if descending else values, kind="stable")]
+
+# row_ids stay in table order (bitmaps, charts, families); the table, the page and the exports follow the sort
+row_sort = sort_from_state(st.session_state)
+result_ids = row_ids
+if row_sort is not None:
+    result_ids = cache_get(QUERY_CACHE, ("sorted", DATA_FILE, spec_key, row_sort), DATA_VERSION)
+    if result_ids is None:
+        result_ids = sort_rows(STORE, row_ids, row_sort)
+        result_ids.setflags(write=False)
+        cache_put(QUERY_CACHE, ("sorted", DATA_FILE, spec_key, row_sort), DATA_VERSION, result_ids)
+
+# Large-dataset mode: only the selected page of rows is parsed and displayed
+if LARGE_MODE:
+    n_pages = max(1, -(-n_filtered // PAGE_SIZE))
+    if st.session_state.get("page", 1) > n_pages:
+        st.session_state["page"] = n_pages
+    page_col, _ = st.columns([2, 10])
+    with page_col:
+        page = st.number_input("Page:", min_value=1, max_value=n_pages, step=1, key="page")
+    page_ids = result_ids[(page - 1) * PAGE_SIZE: page * PAGE_SIZE]
+else:
+    page_ids = result_ids
 
-def apply_pass_choice(data: pd.DataFrame, choice: str, helper_col: str) -> pd.DataFrame:
-    if not choice or choice == "Show all":
-        return data
-    if choice == "PASSED":
-        return data[data[helper_col] == "TRUE"]
-    if choice == "NOT PASSED":
-        return data[data[helper_col] == "FALSE"]
-    return data
+def project(ids, columns):
+    """Columns `columns` of rows `ids` as one new frame (rows parsed from the table file in large-dataset mode).
+
+    The selection travels as row ids; display, exports and charts each take
+    only the columns they need, at the end.
+    """
+    if LARGE_MODE:
+        return read_rows(STORE, ids)[columns]
+    return df.iloc[ids, df.columns.get_indexer(columns)]
 
-filtered = apply_pass_choice(filtered, conservation_choice, "_Conservation_tf")
-filtered = apply_pass_choice(filtered, expression_choice,   "_Expression_tf")
-filtered = apply_pass_choice(filtered, structure_choice,    "_Structure_tf")
-
-# hsa specificity
-if hsa_choice != "Show all":
-    hsa_flag = filtered["hsa-specificity"].astype(str).str.strip().str.upper()
-    if hsa_choice == "Only hsa-specific":
-        filtered = filtered[hsa_flag == "YES"]
-    elif hsa_choice == "Not hsa-specific":
-        filtered = filtered[hsa_flag == "NO"]
-
-# Database/Class filters
-if mirgene_filter == "In both":
-    filtered = filtered[filtered["Class_miRBase"] == filtered["Class_MirGeneDB"]]
-elif mirgene_filter == "Only in miRBase":
-    filtered = filtered[(filtered["Class_miRBase"].notna()) & (filtered["Class_MirGeneDB"] == "—")]
-
-if classes_selected and "Class_miRBase" in filtered.columns:
-    filtered = filtered[filtered["Class_miRBase"].isin(classes_selected)]
-
-# Family filter (unchanged)
-if family_selected:
-    fam_mask = pd.Series(False, index=filtered.index)
-    mirbase_flag = filtered["miRBase family"].astype(str).str.strip().str.upper()
-    mirgenedb_flag = filtered["MirGeneDB family"].astype(str).str.strip().str.upper()
-
-    if "Single miRNAs – miRBase" in family_selected:
-        fam_mask |= (mirbase_flag == "NO")
-    if "miRNAs in family – miRBase" in family_selected:
-        fam_mask |= (mirbase_flag == "YES")
-
-    if "Single miRNAs – MirGeneDB" in family_selected:
-        fam_mask |= (mirgenedb_flag == "NO")
-    if "miRNAs in family – MirGeneDB" in family_selected:
-        fam_mask |= (mirgenedb_flag == "YES")
-
-    filtered = filtered[fam_mask]
-
-# Repeat class
-if repeats_selected:
-    filtered = filtered[filtered["Repeat_Class"].isin(repeats_selected)]
-
-# Conservation advanced filters
-species_na_cols = [animal_sidebar_rev[x] for x in species_na_sidebar] if species_na_sidebar else []
-species_found_cols = [animal_sidebar_rev[x] for x in species_found_sidebar] if species_found_sidebar else []
-
-if species_na_cols:
-    tmp_na = filtered[species_na_cols]
-    filtered = filtered[tmp_na.isna().all(axis=1)]
-
-if species_found_cols:
-    tmp_found = filtered[species_found_cols]
-    filtered = filtered[tmp_found.isin([True, False]).all(axis=1)]
-
-    if stability_choice and stability_choice != "All":
-        allowed_val = True if stability_choice.startswith("Stable") else False
-        filtered = filtered[tmp_found.isin([allowed_val]).all(axis=1)]
-
-# Expressed in: >= 1.5
-if tissues_filter:
-    tissue_num = filtered[tissues_filter].apply(pd.to_numeric, errors="coerce")
-    expressed_mask = (tissue_num >= 1.5).all(axis=1)
-    filtered = filtered[expressed_mask]
-
-# Not expressed in: < 1.5
-if tissues_not_filter:
-    tissue_num_not = filtered[tissues_not_filter].apply(pd.to_numeric, errors="coerce")
-    not_expressed_mask = (tissue_num_not < 1.5).all(axis=1)
-    filtered = filtered[not_expressed_mask]
-
-# Search any column
-if search_term:
-    mask = filtered.astype(str).apply(lambda col: col.str.contains(search_term, case=False, na=False)).any(axis=1)
-    filtered = filtered[mask]
+lap("search")
 
 # -----------------------------------------------------------
 # FASTA EXPORT
 # -----------------------------------------------------------
-def generate_fasta(df_):
-    lines = []
-    for _, r in df_.iterrows():
-        if pd.notna(r.get("sequence", pd.NA)):
-            lines.append(f">{r['miRNA']}")
-            lines.append(str(r["sequence"]).replace(" ", "").upper())
-    return "\n".join(lines)
+def one_per_hairpin_group(ids):
+    labels, _ = artifact("hairpins", wait=True)
+    keep = ~pd.Series(labels[ids]).duplicated().to_numpy()
+    return ids[keep]
+
+def generate_fasta(ids, one_per_group=False):
+    if one_per_group:
+        ids = one_per_hairpin_group(ids)
+    if "sequence" not in TABLE_COLUMNS:
+        return ""
+    rows = project(ids, ["miRNA", "sequence"]).dropna(subset=["sequence"])
+    sequences = rows["sequence"].astype(str).str.replace(" ", "", regex=False).str.upper()
+    return "\n".join(">" + rows["miRNA"].astype(str) + "\n" + sequences)
 
 # -----------------------------------------------------------
-# PREP TABLE DISPLAY (WEB)
+# PREP TABLE EXPORT (TSV CLEAN)
 # -----------------------------------------------------------
-df_display = filtered.copy()
-
-df_display["Conservation"] = df_display["Conservation_display"]
-df_display["Expression"] = df_display["Expression_display"]
-df_display["Structure"] = df_display["Structure_display"]
-
-df_display["miRBase family"] = df_display["miRBase_family_display"]
-df_display["MirGeneDB family"] = df_display["MirGeneDB_family_display"]
-
-df_display = df_display.rename(columns=animal_display_names)
-
-if "sequence" in df_display.columns:
-    df_display = df_display.drop(columns=["sequence"])
-
-df_display = df_display.rename(columns={
-    "Repeat_Class": "Repeat Class",
-    "Class_miRBase": "Class miRBase",
-    "Class_MirGeneDB": "Class MirGeneDB",
-})
-
-mandatory_display_cols = [
-    "miRNA","Conservation","Expression","Structure",
-    "MirGeneDB family","miRBase family","hsa-specificity","Repeat Class",
-]
-
-animals_to_show_display = [animal_display_names[c] for c in animals_to_show if c in animal_display_names]
-tissues_to_show_display = [c for c in tissues_to_show if c in df_display.columns]
-class_to_show_display = ["Class miRBase", "Class MirGeneDB"] if show_class_cols else []
-
-desired_order = (
-    ["miRNA", "Conservation"]
-    + animals_to_show_display
-    + ["Expression"]
-    + tissues_to_show_display
-    + ["Structure"]
-    + class_to_show_display
-    + ["MirGeneDB family","miRBase family","hsa-specificity","Repeat Class"]
-)
-
-visible_cols = []
-for c in desired_order:
-    if (c in mandatory_display_cols) or (c in animals_to_show_display) or (c in tissues_to_show_display) or (c in class_to_show_display):
-        if c in df_display.columns:
-            visible_cols.append(c)
-
-if not visible_cols:
-    visible_cols = [c for c in mandatory_display_cols if c in df_display.columns]
-
-helper_cols = [
-    "_Conservation_tf",
-    "_Expression_tf","_Structure_tf",
-    "_miRBase_family_flag","_MirGeneDB_family_flag",
-]
-helper_cols_present = [c for c in helper_cols if c in df_display.columns]
-df_display = df_display[visible_cols + helper_cols_present]
+def tsv_export(df_disp, helper_cols_present):
+    """TSV bytes of the visible columns (HTML stripped from the headers), written straight from the display frame."""
+    cols = [c for c in df_disp.columns if c not in helper_cols_present]
+    header = pd.Index(cols).str.replace(r"<.*?>", "", regex=True).tolist()
+    return df_disp.to_csv(columns=cols, header=header, index=False, sep="\t").encode("utf-8")
 
 # -----------------------------------------------------------
-# PREP TABLE EXPORT (TSV CLEAN)
+# BUNDLE EXPORT (zip of the complete result, built in a worker thread)
+# table with every annotation column, FASTA, filter spec and dataset hash,
+# written into the archive chunk by chunk so the worker can report progress;
+# archives are spooled to temporary files, not kept in memory; jobs are
+# process-wide, sessions with the same selection share one archive, and a
+# finished archive is deleted once downloaded or when the disk budget is exceeded
 # -----------------------------------------------------------
-def prepare_tsv_export(df_disp):
-    export_df = df_disp.copy()
-    export_df = export_df.drop(columns=helper_cols_present, errors="ignore")
-    export_df.columns = export_df.columns.str.replace(r"<.*?>", "", regex=True)
-    return export_df
+BUNDLE_CHUNK_ROWS = 2000
+BUNDLE_CACHE_BYTES = int(os.environ.get("MIRRF_BUNDLE_CACHE_MB", "512")) * 1024 * 1024
+BUNDLE_POLL_SECONDS = 0.5
+
+def drop_bundle_file(job):
+    if job.get("path"):
+        Path(job["path"]).unlink(missing_ok=True)
+
+def drop_bundles(jobs):
+    for job in jobs["jobs"].values():
+        drop_bundle_file(job)
+
+@st.cache_resource(on_release=drop_bundles)
+def bundle_jobs():
+    return {"jobs": OrderedDict(), "lock": threading.Lock()}     # key -> job, least recently used first
+
+def bundle_columns():
+    """Every annotation column of the table, without the app's helper and display columns."""
+    return [c for c in TABLE_COLUMNS if not c.startswith("_") and not c.endswith("_display")]
+
+def file_sha256(path, chunk=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while block := fh.read(chunk):
+            digest.update(block)
+    return digest.hexdigest()
+
+def write_bundle(job, ids, spec, path, version):
+    """Zip of rows `ids` in a temporary file, returns its path; job["progress"] / job["stage"] are updated after every chunk."""
+    starts = range(0, len(ids), BUNDLE_CHUNK_ROWS)
+    steps = 2 * len(starts) + 1
+    done = 0
+
+    def step(stage):
+        nonlocal done
+        done += 1
+        job["progress"], job["stage"] = done / steps, stage
+
+    columns = bundle_columns()
+    fh = tempfile.NamedTemporaryFile(prefix="mirrf-bundle-", suffix=".zip", delete=False)
+    try:
+        with fh, zipfile.ZipFile(fh, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            with zf.open("mirna_filtered_table.tsv", "w", force_zip64=True) as out:
+                out.write(project(ids[:0], columns).to_csv(index=False, sep="\t").encode("utf-8"))
+                for start in starts:
+                    chunk = ids[start:start + BUNDLE_CHUNK_ROWS]
+                    out.write(project(chunk, columns).to_csv(header=False, index=False, sep="\t").encode("utf-8"))
+                    step(f"Table: {start + len(chunk):,} of {len(ids):,} rows")
+
+            with zf.open("mirna_selected.fasta", "w", force_zip64=True) as out:
+                for start in starts:
+                    chunk = ids[start:start + BUNDLE_CHUNK_ROWS]
+                    fasta = generate_fasta(chunk)
+                    if fasta:
+                        out.write((fasta + "\n").encode("utf-8"))
+                    step(f"FASTA: {start + len(chunk):,} of {len(ids):,} rows")
+
+            zf.writestr("filters.json", json.dumps(spec, indent=1, ensure_ascii=False))
+            zf.writestr("dataset.json", json.dumps({
+                "file": Path(path).name,
+                "version": version,
+                "sha256": file_sha256(path),
+                "rows": STORE["n"],
+                "rows_selected": len(ids),
+            }, indent=1))
+            step("Dataset hash")
+
+        if dataset_version(path) != version:
+            raise RuntimeError("the table was updated while the bundle was built")
+    except BaseException:
+        Path(fh.name).unlink(missing_ok=True)
+        raise
+    return fh.name
+
+def prune_bundles(jobs, keep):
+    """Deletes the least recently used finished archives (other than `keep`) while the total exceeds the budget."""
+    total = sum(j["size"] for j in jobs["jobs"].values())
+    for k, j in list(jobs["jobs"].items()):
+        if total <= BUNDLE_CACHE_BYTES:
+            break
+        if j["status"] == "done" and k != keep:
+            total -= j["size"]
+            drop_bundle_file(jobs["jobs"].pop(k))
+
+def run_bundle_job(jobs, key, job, build):
+    try:
+        job["path"] = build(job)
+        job["size"] = os.path.getsize(job["path"])
+        job["status"] = "done"
+    except Exception as exc:            # reported in the panel; the button starts a new job
+        job["error"] = str(exc) or repr(exc)
+        job["status"] = "error"
+    with jobs["lock"]:
+        prune_bundles(jobs, keep=key)
+
+def start_bundle(jobs, key, build):
+    """The job building bundle `key`: the running / finished one if any, else a new worker thread."""
+    with jobs["lock"]:
+        job = jobs["jobs"].get(key)
+        if job is None or job["status"] == "error":
+            job = {"status": "running", "progress": 0.0, "stage": "Starting", "path": None, "size": 0, "error": None}
+            jobs["jobs"][key] = job
+            threading.Thread(target=run_bundle_job, args=(jobs, key, job, build), name="bundle-export", daemon=True).start()
+        jobs["jobs"].move_to_end(key)
+    return job
+
+def take_bundle(jobs, key, build):
+    """Bytes of finished bundle `key` for the download, which evicts the job and deletes its file;
+    built again on the spot if the job is gone (another session downloaded it first)."""
+    with jobs["lock"]:
+        job = jobs["jobs"].get(key)
+        if job is not None and job["status"] == "done":
+            del jobs["jobs"][key]
+        else:
+            job = None
+    path = job["path"] if job is not None else build({})
+    try:
+        return Path(path).read_bytes()
+    finally:
+        Path(path).unlink(missing_ok=True)
 
-tsv_export_df = prepare_tsv_export(df_display)
+BUNDLE_JOBS = bundle_jobs()
 
 # -----------------------------------------------------------
 # TABLE STYLING
@@ -1203,40 +3307,6 @@ def class_bg(v):
         return f"background-color:{CLASS_S_BG}; color: black !important;"
     return ""
 
-visible_species_cols = [animal_display_names[c] for c in animals_to_show if c in animal_display_names]
-visible_species_cols = [c for c in visible_species_cols if c in df_display.columns]
-visible_tissue_cols = [c for c in tissues_to_show_display if c in df_display.columns]
-visible_class_cols = [c for c in class_to_show_display if c in df_display.columns]
-
-styled_df = df_display.style
-
-if visible_species_cols:
-    styled_df = (
-        styled_df
-        .applymap(color_binary, subset=visible_species_cols)
-        .applymap(hide_text_species, subset=visible_species_cols)
-    )
-
-if "hsa-specificity" in df_display.columns:
-    styled_df = (
-        styled_df
-        .applymap(color_hsa, subset=["hsa-specificity"])
-        .applymap(
-            lambda _v: "color: transparent !important; text-shadow: 0 0 0 transparent !important;",
-            subset=["hsa-specificity"],
-        )
-    )
-
-if "Repeat Class" in df_display.columns:
-    styled_df = styled_df.applymap(bg_repeat, subset=["Repeat Class"])
-
-if visible_tissue_cols:
-    styled_df = styled_df.format({c: fmt_2dec for c in visible_tissue_cols}, na_rep="")
-    styled_df = styled_df.applymap(tissue_bg, subset=visible_tissue_cols)
-
-if visible_class_cols:
-    styled_df = styled_df.applymap(class_bg, subset=visible_class_cols)
-
 def style_row(row):
     # -2px (was 12px -> now 10px)
     styles = ["font-weight: 700; font-size: 10px;"] * len(row)
@@ -1256,12 +3326,236 @@ def style_row(row):
 
     return styles
 
-styled_df = styled_df.apply(style_row, axis=1)
+# -----------------------------------------------------------
+# PREP TABLE DISPLAY (WEB)
+# -----------------------------------------------------------
+# web table column -> column of the prepared table it shows
+DISPLAY_SOURCE = {
+    "Conservation": "Conservation_display",
+    "Expression": "Expression_display",
+    "Structure": "Structure_display",
+    "miRBase family": "miRBase_family_display",
+    "MirGeneDB family": "MirGeneDB_family_display",
+    "Repeat Class": "Repeat_Class",
+    "Class miRBase": "Class_miRBase",
+    "Class MirGeneDB": "Class_MirGeneDB",
+    **{name: col for col, name in animal_display_names.items()},
+}
+
+# sequence feature column -> decimals shown
+SEQUENCE_DECIMALS = {label: decimals for label, decimals in SEQUENCE_FEATURES.values()}
+
+def display_frame(ids, view):
+    """Visible columns (display names, table order) of rows `ids`, plus the hidden helper columns.
+
+    Only these columns are taken from the dataset, in one projection.
+    """
+    animals_to_show, tissues_to_show = view["species"], view["tissues"]
+    show_class_cols, group_hairpins = view["class_cols"], view["group_hairpins"]
+
+    available = {name for name, col in DISPLAY_SOURCE.items() if col in TABLE_COLUMNS}
+    available.update(c for c in TABLE_COLUMNS if c not in DISPLAY_SOURCE.values())
+
+    mandatory_display_cols = [
+        "miRNA","Conservation","Expression","Structure",
+        "MirGeneDB family","miRBase family","hsa-specificity","Repeat Class",
+    ]
+
+    animals_to_show_display = [animal_display_names[c] for c in animals_to_show if c in animal_display_names]
+    tissues_to_show_display = [c for c in tissues_to_show if c in available]
+    class_to_show_display = ["Class miRBase", "Class MirGeneDB"] if show_class_cols else []
+    seq_to_show_display = [SEQUENCE_FEATURES[f][0] for f in view.get("seq_features", [])]
+
+    desired_order = (
+        ["miRNA"]
+        + ["Conservation"]
+        + animals_to_show_display
+        + ["Expression"]
+        + tissues_to_show_display
+        + ["Structure"]
+        + class_to_show_display
+        + seq_to_show_display
+        + ["MirGeneDB family","miRBase family","hsa-specificity","Repeat Class"]
+    )
+
+    visible_cols = [c for c in desired_order if c in available or c in seq_to_show_display]
+    if not visible_cols:
+        visible_cols = [c for c in mandatory_display_cols if c in available]
+
+    helper_cols = [
+        "_Conservation_tf",
+        "_Expression_tf","_Structure_tf",
+        "_miRBase_family_flag","_MirGeneDB_family_flag",
+    ]
+    helper_cols_present = [c for c in helper_cols if c in TABLE_COLUMNS]
+
+    # Hairpin groups: members become adjacent, labelled by the group's first miRNA;
+    # in a sorted table the groups follow the sort (order of their first member)
+    ids = np.asarray(ids)
+    if group_hairpins:
+        hairpin_group, hairpin_group_size = artifact("hairpins", wait=True)
+        group_order = hairpin_group[ids]
+        if view.get("sort"):
+            _, first_member, inverse = np.unique(group_order, return_index=True, return_inverse=True)
+            group_order = first_member[inverse]
+        ids = ids[np.argsort(group_order, kind="stable")]
+
+    columns = visible_cols + helper_cols_present
+    table_cols = [c for c in columns if c not in seq_to_show_display]
+    df_display = project(ids, [DISPLAY_SOURCE.get(c, c) for c in table_cols])
+    df_display.columns = table_cols
+
+    # sequence features come from the column store, rounded as shown
+    for name, col in zip(view.get("seq_features", []), seq_to_show_display):
+        values = pd.Series(STORE["sequence"][SEQUENCE_FEATURE_NAMES.index(name)][ids], dtype="float64")
+        decimals = SEQUENCE_FEATURES[name][1]
+        values = values.round(decimals).astype("Int64") if decimals == 0 else values.round(decimals)
+        df_display.insert(columns.index(col), col, values.array)
+
+    if group_hairpins:
+        df_display.insert(1, "Hairpin group", np.where(
+            hairpin_group_size[ids] > 1,
+            [f"{df['miRNA'].iat[g]} ({n})" for g, n in zip(hairpin_group[ids], hairpin_group_size[ids])],
+            "",
+        ))
+        visible_cols.insert(1, "Hairpin group")
+
+    return {
+        "frame": df_display,
+        "helpers": helper_cols_present,
+        "species_cols": [c for c in animals_to_show_display if c in df_display.columns],
+        "tissue_cols": [c for c in tissues_to_show_display if c in df_display.columns],
+        "class_cols": [c for c in class_to_show_display if c in df_display.columns],
+        "seq_cols": [c for c in seq_to_show_display if c in df_display.columns],
+    }
+
+# grid mode: the native dataframe grid has no per-cell colours, so the
+# coloured cells of the HTML table become legend-coloured markers
+PASS_MARKS = {"TRUE": "🟩", "FALSE": "🟥"}
+FAMILY_MARKS = {"YES": "🟧", "NO": "🟦"}
+SPECIES_MARKS = {True: "🟧 stable", False: "🟪 unstable"}
+GRID_HEIGHT = 720
+
+def grid_table(disp):
+    """Arrow table + column config of a display frame for the native dataframe grid."""
+    import pyarrow as pa
+
+    frame = disp["frame"]
+    for col, flag, marks in (
+        ("Conservation", "_Conservation_tf", PASS_MARKS),
+        ("Expression", "_Expression_tf", PASS_MARKS),
+        ("Structure", "_Structure_tf", PASS_MARKS),
+        ("miRBase family", "_miRBase_family_flag", FAMILY_MARKS),
+        ("MirGeneDB family", "_MirGeneDB_family_flag", FAMILY_MARKS),
+    ):
+        if col in frame.columns and flag in frame.columns:
+            mark = frame[flag].astype("string").str.upper().map(marks).fillna("")
+            frame[col] = (mark + " " + frame[col].astype("string").fillna("")).str.strip()
+    for col in disp["species_cols"]:
+        frame[col] = frame[col].map(lambda v: SPECIES_MARKS.get(v, "⬜ not found") if isinstance(v, bool) else "⬜ not found")
+    visible = [c for c in frame.columns if c not in disp["helpers"]]
+    for col in visible:
+        if frame[col].dtype == object:
+            frame[col] = frame[col].astype("string")
+
+    config = {"miRNA": st.column_config.TextColumn("miRNA", pinned=True)}
+    for col in disp["tissue_cols"]:
+        config[col] = st.column_config.NumberColumn(col, format="%.2f")
+    for col in disp["seq_cols"]:
+        config[col] = st.column_config.NumberColumn(col, format=f"%.{SEQUENCE_DECIMALS[col]}f")
+    return pa.Table.from_pandas(frame, columns=visible, preserve_index=False), config
+
+def arrow_payload_size(table):
+    """Bytes of the Arrow IPC stream the dataframe grid sends to the browser."""
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+def build_table_artifacts(ids, view, mark=lambda stage: None):
+    """Web table (styled HTML or Arrow grid) + TSV export of rows `ids` for one table view."""
+    disp = display_frame(ids, view)
+    df_display, helper_cols_present = disp["frame"], disp["helpers"]
+    visible_species_cols, visible_tissue_cols, visible_class_cols = (
+        disp["species_cols"], disp["tissue_cols"], disp["class_cols"]
+    )
+
+    mark("display")
+    tsv_bytes = tsv_export(df_display, helper_cols_present)
+    mark("tsv")
+
+    artifacts = {
+        "tsv": tsv_bytes,
+        "species_cols": visible_species_cols,
+        "tissue_cols": visible_tissue_cols,
+        "class_cols": visible_class_cols,
+    }
+
+    if view["grid"]:
+        artifacts["grid"], artifacts["grid_config"] = grid_table(disp)
+        artifacts["payload_bytes"] = arrow_payload_size(artifacts["grid"])
+        mark("arrow")
+        return artifacts
+
+    styled_df = df_display.style
+
+    if visible_species_cols:
+        styled_df = (
+            styled_df
+            .applymap(color_binary, subset=visible_species_cols)
+            .applymap(hide_text_species, subset=visible_species_cols)
+        )
+
+    if "hsa-specificity" in df_display.columns:
+        styled_df = (
+            styled_df
+            .applymap(color_hsa, subset=["hsa-specificity"])
+            .applymap(
+                lambda _v: "color: transparent !important; text-shadow: 0 0 0 transparent !important;",
+                subset=["hsa-specificity"],
+            )
+        )
 
-if helper_cols_present:
-    styled_df = styled_df.hide(axis="columns", subset=helper_cols_present)
+    if "Repeat Class" in df_display.columns:
+        styled_df = styled_df.applymap(bg_repeat, subset=["Repeat Class"])
 
-html_table = styled_df.hide(axis="index").to_html(escape=False)
+    if visible_tissue_cols:
+        styled_df = styled_df.format({c: fmt_2dec for c in visible_tissue_cols}, na_rep="")
+        styled_df = styled_df.applymap(tissue_bg, subset=visible_tissue_cols)
+
+    if visible_class_cols:
+        styled_df = styled_df.applymap(class_bg, subset=visible_class_cols)
+
+    if disp["seq_cols"]:
+        styled_df = styled_df.format(
+            {c: f"{{:.{SEQUENCE_DECIMALS[c]}f}}" for c in disp["seq_cols"]}, na_rep=""
+        )
+
+    styled_df = styled_df.apply(style_row, axis=1)
+
+    if helper_cols_present:
+        styled_df = styled_df.hide(axis="columns", subset=helper_cols_present)
+
+    mark("styler")
+    artifacts["html"] = styled_df.hide(axis="index").to_html(escape=False)
+    artifacts["payload_bytes"] = len(artifacts["html"].encode("utf-8"))
+    mark("to_html")
+    return artifacts
+
+# rendered table and TSV come from the query cache when any session
+# already built them for the same filters and view
+table_view = table_view_from_state(st.session_state, int(page) if LARGE_MODE else None)
+table_key = ("table", DATA_FILE, spec_key, json.dumps(table_view, sort_keys=True))
+table_artifacts = cache_get(QUERY_CACHE, table_key, DATA_VERSION)
+if table_artifacts is None:
+    table_artifacts = cache_put(QUERY_CACHE, table_key, DATA_VERSION, build_table_artifacts(page_ids, table_view, lap))
+
+tsv_bytes = table_artifacts["tsv"]
+visible_species_cols = table_artifacts["species_cols"]
+visible_tissue_cols = table_artifacts["tissue_cols"]
+visible_class_cols = table_artifacts["class_cols"]
 
 # -----------------------------------------------------------
 # CSS — TABLE + LEGEND (RESPONSIVE)  (-2px everywhere)
@@ -1440,16 +3734,13 @@ custom_css = r"""
 """
 
 # -----------------------------------------------------------
-# ROW COUNT
-# -----------------------------------------------------------
-st.write(f"Rows shown: **{len(filtered)}**")
-
-# -----------------------------------------------------------
-# LEGEND (ABOVE TABLE)
+# ROW COUNT + LEGEND + TABLE
 # -----------------------------------------------------------
-legend_cards = []
+def legend_html():
+    """Colour legend cards for the visible columns and the active species filters."""
+    legend_cards = []
 
-legend_cards.append(f"""
+    legend_cards.append(f"""
 <div class="legend-card">
   <div class="legend-title">Filter</div>
   <div class="legend-row">
@@ -1459,7 +3750,7 @@ legend_cards.append(f"""
 </div>
 """)
 
-legend_cards.append(f"""
+    legend_cards.append(f"""
 <div class="legend-card">
   <div class="legend-title">Family</div>
   <div class="legend-row">
@@ -1469,7 +3760,7 @@ legend_cards.append(f"""
 </div>
 """)
 
-legend_cards.append(f"""
+    legend_cards.append(f"""
 <div class="legend-card">
   <div class="legend-title">hsa specificity</div>
   <div class="legend-row">
@@ -1479,7 +3770,7 @@ legend_cards.append(f"""
 </div>
 """)
 
-legend_cards.append(f"""
+    legend_cards.append(f"""
 <div class="legend-card">
   <div class="legend-title">Repeat Class</div>
   <div class="legend-row">
@@ -1489,9 +3780,9 @@ legend_cards.append(f"""
 </div>
 """)
 
-species_filter_active = bool(species_found_cols or species_na_sidebar)
-if visible_species_cols or species_filter_active:
-    legend_cards.append(f"""
+    species_filter_active = bool(filter_spec["species_found"] or filter_spec["species_na"])
+    if visible_species_cols or species_filter_active:
+        legend_cards.append(f"""
 <div class="legend-card">
   <div class="legend-title">Species conservation</div>
   <div class="legend-row">
@@ -1502,8 +3793,8 @@ if visible_species_cols or species_filter_active:
 </div>
 """)
 
-if visible_tissue_cols:
-    legend_cards.append(f"""
+    if visible_tissue_cols:
+        legend_cards.append(f"""
 <div class="legend-card">
   <div class="legend-title">Tissue value</div>
   <div class="legend-row">
@@ -1513,8 +3804,8 @@ if visible_tissue_cols:
 </div>
 """)
 
-if visible_class_cols:
-    legend_cards.append(f"""
+    if visible_class_cols:
+        legend_cards.append(f"""
 <div class="legend-card">
   <div class="legend-title">Class (miRBase / MirGeneDB)</div>
   <div class="legend-row">
@@ -1526,27 +3817,49 @@ if visible_class_cols:
 </div>
 """)
 
-st.markdown(f"<div class='legend-wrap'>{''.join(legend_cards)}</div>", unsafe_allow_html=True)
-st.markdown("<div style='height:6px'></div>", unsafe_allow_html=True)
+    return f"<div class='legend-wrap'>{''.join(legend_cards)}</div>"
+
+def results_table():
+    st.write(f"Rows shown: **{n_filtered}**")
+    if filter_spec["expand_families"] in FAMILY_SOURCES and "families" in ARTIFACTS:
+        st.caption(f"Expanded to whole {filter_spec['expand_families']} families (see *Family view*).")
+    if LARGE_MODE and n_filtered:
+        first_row = (page - 1) * PAGE_SIZE + 1
+        st.caption(
+            f"Large-dataset mode: rows {first_row}–{first_row + len(page_ids) - 1} of {n_filtered} "
+            f"(page {page} of {n_pages}); TSV and FASTA downloads cover this page."
+        )
 
-# -----------------------------------------------------------
-# SHOW TABLE
-# -----------------------------------------------------------
-st.markdown(
-    custom_css
-    + "<div class='table-container'><div class='table-inner'>"
-    + html_table
-    + "</div></div>",
-    unsafe_allow_html=True
-)
+    # LEGEND (ABOVE TABLE)
+    st.markdown(legend_html(), unsafe_allow_html=True)
+    st.markdown("<div style='height:6px'></div>", unsafe_allow_html=True)
+
+    # SHOW TABLE
+    if "grid" in table_artifacts:
+        st.dataframe(
+            table_artifacts["grid"],
+            column_config=table_artifacts["grid_config"],
+            hide_index=True,
+            use_container_width=True,
+            height=GRID_HEIGHT,
+        )
+    else:
+        st.markdown(
+            custom_css
+            + "<div class='table-container'><div class='table-inner'>"
+            + table_artifacts["html"]
+            + "</div></div>",
+            unsafe_allow_html=True
+        )
+    lap("render")
+
+results_table()
 
 # -----------------------------------------------------------
 # DOWNLOAD BUTTONS (TSV + FASTA)
 # -----------------------------------------------------------
-tsv_bytes = tsv_export_df.to_csv(index=False, sep="\t").encode("utf-8")
-
-dl_col, _ = st.columns([2, 10])
-with dl_col:
+@partial_rerun
+def downloads():
     st.download_button(
         "Download table (TSV)",
         data=tsv_bytes,
@@ -1556,89 +3869,621 @@ with dl_col:
         use_container_width=False,
     )
 
+    fasta_one_per_group = "hairpins" in ARTIFACTS and st.checkbox(
+        "One representative per hairpin group",
+        value=False,
+        key="fasta_one_per_group",
+    )
+    lap("render")
+    fasta_key = ("fasta", DATA_FILE, spec_key, table_view["page"], bool(fasta_one_per_group), row_sort)
+    fasta_bytes = cache_get(QUERY_CACHE, fasta_key, DATA_VERSION)
+    if fasta_bytes is None:
+        fasta_bytes = generate_fasta(page_ids, one_per_group=fasta_one_per_group).encode("utf-8")
+        cache_put(QUERY_CACHE, fasta_key, DATA_VERSION, fasta_bytes)
+    lap("fasta")
     st.download_button(
         "Get FASTA",
-        data=generate_fasta(filtered).encode("utf-8"),
+        data=fasta_bytes,
         file_name="mirna_selected.fasta",
         mime="text/plain",
         key="dl_fasta",
         use_container_width=False,
     )
 
+bundle_key = (DATA_FILE, DATA_VERSION, spec_key, row_sort)
+bundle_running = BUNDLE_JOBS["jobs"].get(bundle_key, {}).get("status") == "running"
+build_bundle = functools.partial(write_bundle, ids=result_ids, spec=filter_spec, path=DATA_FILE, version=DATA_VERSION)
+
+@st.fragment(run_every=BUNDLE_POLL_SECONDS if bundle_running else None)
+def bundle_export():
+    """Starts the bundle worker, then polls it: while the archive is built only this panel reruns."""
+    job = BUNDLE_JOBS["jobs"].get(bundle_key)
+    status = job["status"] if job is not None else None
+    if bundle_running and status != "running":
+        st.rerun()          # finished while polling: redraw the page once, without the poll
+
+    if status == "running":
+        st.progress(job["progress"], text=f"Building bundle… {job['stage']}")
+    elif status == "done":
+        st.download_button(
+            "Download bundle (zip)",
+            data=functools.partial(take_bundle, BUNDLE_JOBS, bundle_key, build_bundle),
+            file_name="mirna_bundle.zip",
+            mime="application/zip",
+            key="dl_bundle",
+            use_container_width=False,
+        )
+    else:
+        if status == "error":
+            st.error(f"The bundle could not be built: {job['error']}. Please try again.")
+        if st.button(
+            "Prepare bundle (zip)",
+            key="bundle_build",
+            help="Filtered table with all columns, FASTA, active filters (JSON) and dataset hash.",
+        ):
+            start_bundle(BUNDLE_JOBS, bundle_key, build_bundle)
+            st.rerun()      # the whole page: the panel is defined again with polling on
+
+dl_col, _ = st.columns([2, 10])
+with dl_col:
+    downloads()
+    bundle_export()
+
 # -----------------------------------------------------------
-# BARPLOT (Repeat distribution) — THEME-AWARE + shown on demand
+# SUMMARY PLOTS — THEME-AWARE + shown on demand
+# only aggregate rows reach Altair; specs are cached per result set
 # -----------------------------------------------------------
 ucscgb_palette = ["#009ADE","#7CC242","#F98B2A","#E4002B","#B7312C","#E78AC3","#00A4A6","#00458A"]
 repeat_order = ["LINE","SINE","LTR","DNA","Satellite repeats","Simple repeats","Low complexity","No repeat","tRNA","RC"]
 
-show_repeat_plot = st.session_state.get("show_repeat_plot", False)
+def themed(chart):
+    return (
+        chart
+        .configure(background="transparent")
+        .configure_view(fill="transparent", strokeOpacity=0)
+        .configure_axis(
+            labelColor="currentColor",
+            titleColor="currentColor",
+            labelFontSize=12,          # 14 -> 12
+            titleFontSize=14,          # 16 -> 14
+            grid=True,
+            gridColor="currentColor",
+            gridOpacity=0.12,
+            domainColor="currentColor",
+            domainOpacity=0.55,
+            tickColor="currentColor",
+            tickOpacity=0.55
+        )
+        .configure_legend(labelColor="currentColor", titleColor="currentColor")
+        .configure_title(color="currentColor")
+    )
 
-if show_repeat_plot:
-    st.subheader("Repeat class distribution")
-    st.markdown("<div class='plot-card'>", unsafe_allow_html=True)
+def repeat_chart(repeat_counts):
+    import altair as alt
 
-    if "Repeat_Class" in filtered.columns and filtered["Repeat_Class"].notna().any():
-        repeat_counts = filtered.groupby("Repeat_Class").size().reset_index(name="Count")
-        repeat_counts["Percent"] = (repeat_counts["Count"] / repeat_counts["Count"].sum() * 100).round(2)
+    return (
+        alt.Chart(repeat_counts)
+        .mark_bar(
+            stroke="currentColor",
+            strokeOpacity=0.55,
+            strokeWidth=1.2
+        )
+        .encode(
+            x=alt.X(
+                "Repeat_Class:N",
+                sort=repeat_order,
+                title="Repeat class",
+                axis=alt.Axis(
+                    labelAngle=0,
+                    labelFontSize=10.5,   # 12.5 -> 10.5
+                    titleFontSize=14,     # 16 -> 14
+                    titlePadding=34,
+                )
+            ),
+            y=alt.Y(
+                "Count:Q",
+                title="Count",
+                axis=alt.Axis(
+                    labelFontSize=12,     # 14 -> 12
+                    titleFontSize=14      # 16 -> 14
+                )
+            ),
+            color=alt.Color(
+                "Repeat_Class:N",
+                scale=alt.Scale(domain=repeat_order, range=ucscgb_palette),
+                legend=None
+            ),
+            tooltip=["Repeat_Class", "Count", "Percent"]
+        )
+        .properties(height=560)
+    )
 
-        barplot = (
-            alt.Chart(repeat_counts)
-            .mark_bar(
-                stroke="currentColor",
-                strokeOpacity=0.55,
-                strokeWidth=1.2
-            )
-            .encode(
-                x=alt.X(
-                    "Repeat_Class:N",
-                    sort=repeat_order,
-                    title="Repeat class",
-                    axis=alt.Axis(
-                        labelAngle=0,
-                        labelFontSize=10.5,   # 12.5 -> 10.5
-                        titleFontSize=14,     # 16 -> 14
-                        titlePadding=34,
-                    )
-                ),
-                y=alt.Y(
-                    "Count:Q",
-                    title="Count",
-                    axis=alt.Axis(
-                        labelFontSize=12,     # 14 -> 12
-                        titleFontSize=14      # 16 -> 14
-                    )
-                ),
-                color=alt.Color(
-                    "Repeat_Class:N",
-                    scale=alt.Scale(domain=repeat_order, range=ucscgb_palette),
-                    legend=None
-                ),
-                tooltip=["Repeat_Class", "Count", "Percent"]
-            )
-            .properties(height=560)
-            .configure(background="transparent")
-            .configure_view(fill="transparent", strokeOpacity=0)
-            .configure_axis(
-                labelColor="currentColor",
-                titleColor="currentColor",
-                labelFontSize=12,          # 14 -> 12
-                titleFontSize=14,          # 16 -> 14
-                grid=True,
-                gridColor="currentColor",
-                gridOpacity=0.12,
-                domainColor="currentColor",
-                domainOpacity=0.55,
-                tickColor="currentColor",
-                tickOpacity=0.55
-            )
-            .configure_title(color="currentColor")
+def species_chart(species_counts):
+    import altair as alt
+
+    return (
+        alt.Chart(species_counts)
+        .mark_bar(stroke="currentColor", strokeOpacity=0.55, strokeWidth=0.8)
+        .encode(
+            y=alt.Y("Species:N", sort=list(animal_sidebar_names.values()), title=None),
+            x=alt.X("Count:Q", stack="zero", title="pre-miRNAs"),
+            color=alt.Color(
+                "State:N",
+                scale=alt.Scale(domain=SPECIES_STATES, range=["#fdb863", "#b2abd2", NA_SPECIES_COLOR]),
+                legend=alt.Legend(orient="bottom", title=None),
+            ),
+            order=alt.Order("Order:Q"),
+            tooltip=["Species", "State", "Count", "Percent"],
+        )
+        .properties(height=420)
+    )
+
+def breadth_chart(breadth_counts):
+    import altair as alt
+
+    return (
+        alt.Chart(breadth_counts)
+        .mark_bar(color=TISSUE_HIGH_BG, stroke="currentColor", strokeOpacity=0.55, strokeWidth=0.8)
+        .encode(
+            x=alt.X("Tissues:O", title="Tissues with RPMM ≥ 1.5", axis=alt.Axis(labelAngle=0, labelOverlap=True)),
+            y=alt.Y("Count:Q", title="pre-miRNAs"),
+            tooltip=["Tissues", "Count"],
+        )
+        .properties(height=420)
+    )
+
+def system_chart(system_summary):
+    import altair as alt
+
+    return (
+        alt.Chart(system_summary)
+        .mark_bar(stroke="currentColor", strokeOpacity=0.55, strokeWidth=0.8)
+        .encode(
+            y=alt.Y("System:N", sort=None, title=None),
+            x=alt.X("Percent:Q", title="% of pre-miRNAs expressed in ≥ 1 tissue", scale=alt.Scale(domain=[0, 100])),
+            color=alt.Color(
+                "System:N",
+                scale=alt.Scale(range=ucscgb_palette),
+                legend=None,
+            ),
+            tooltip=["System", "Expressed", "Percent", "Mean tissues expressed", "Tissues in system"],
         )
+        .properties(height=360)
+    )
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def summary_chart_spec(kind, version, selection_bits, cube_spec=None):
+    """Vega-Lite spec (aggregate rows only) for one chart and one result set of release `version`."""
+    selection_bits = np.frombuffer(selection_bits, dtype=np.uint8)
+    row_mask = np.unpackbits(selection_bits, count=STORE["n"]).astype(bool)
+    n_selected = int(popcount(selection_bits))
+    summary = None if kind == "repeat" else artifact("summary_arrays", wait=True)
+
+    if kind == "repeat":
+        counts = summary_counts(artifact("count_cube", wait=True), cube_spec, row_mask, "Repeat_Class")
+        data = counts[counts > 0].rename_axis("Repeat_Class").reset_index()
+        if data.empty:
+            return None
+        data["Percent"] = (data["Count"] / data["Count"].sum() * 100).round(2)
+        chart = repeat_chart(data)
+
+    elif kind == "species":
+        if not animal_cols or n_selected == 0:
+            return None
+        counts = popcount(summary["species_bits"] & selection_bits)
+        data = pd.DataFrame({
+            "Species": np.repeat([animal_sidebar_names[c] for c in animal_cols], len(SPECIES_STATES)),
+            "State": SPECIES_STATES * len(animal_cols),
+            "Order": list(range(len(SPECIES_STATES))) * len(animal_cols),
+            "Count": counts.ravel(),
+        })
+        data["Percent"] = (data["Count"] / n_selected * 100).round(2)
+        chart = species_chart(data)
+
+    elif kind == "breadth":
+        if n_selected == 0:
+            return None
+        hist = np.bincount(summary["breadth"][row_mask], minlength=summary["n_tissues"] + 1)
+        data = pd.DataFrame({"Tissues": np.arange(hist.size), "Count": hist})
+        data = data[data["Count"] > 0]
+        chart = breadth_chart(data)
+
+    elif kind == "system":
+        if not tissue_cols or n_selected == 0:
+            return None
+        expressed = popcount(summary["system_any_bits"] & selection_bits)
+        sizes = [sum(t in tissue_cols for t in ts) for ts in SYSTEM_TISSUES.values()]
+        data = pd.DataFrame({
+            "System": [system_display_name(k) for k in SYSTEM_TISSUES],
+            "Expressed": expressed,
+            "Percent": (expressed / n_selected * 100).round(2),
+            "Mean tissues expressed": summary["system_count"][row_mask].mean(axis=0).round(2),
+            "Tissues in system": sizes,
+        })
+        chart = system_chart(data)
 
-        st.altair_chart(barplot, use_container_width=True)
     else:
-        st.info("Repeat_Class is missing or empty: barplot not available.")
+        raise ValueError(f"Unknown summary chart: {kind}")
+
+    return themed(chart).to_dict()
+
+SUMMARY_PLOTS = [
+    # (session key, chart kind, checkbox label, title)
+    ("show_repeat_plot", "repeat", "Show repeat class distribution", "Repeat class distribution"),
+    ("show_species_plot", "species", "Show species conservation profile", "Species conservation profile"),
+    ("show_breadth_plot", "breadth", "Show tissue breadth histogram", "Tissue breadth"),
+    ("show_system_plot", "system", "Show expression by system", "Expression by anatomical system"),
+]
+
+def selection_bitmap(ids, n):
+    """Rows `ids` out of n as a packed bitmap (bytes, hashable for the chart cache)."""
+    mask = np.zeros(n, dtype=bool)
+    mask[ids] = True
+    return np.packbits(mask).tobytes()
+
+selection_bits = selection_bitmap(row_ids, STORE["n"])
+cube_spec = filter_spec if spec_on_cube(filter_spec) else None
+
+@partial_rerun
+def summary_plots():
+    # the checkboxes live next to the plots: toggling one reruns this fragment only
+    for col, (plot_key, _, label, _) in zip(st.columns(len(SUMMARY_PLOTS)), SUMMARY_PLOTS):
+        col.checkbox(label, key=plot_key)
+
+    for plot_key, plot_kind, _, plot_title in SUMMARY_PLOTS:
+        if not st.session_state.get(plot_key, False):
+            continue
+
+        st.subheader(plot_title)
+        st.markdown("<div class='plot-card'>", unsafe_allow_html=True)
+
+        spec = summary_chart_spec(plot_kind, DATA_VERSION, selection_bits, cube_spec if plot_kind == "repeat" else None)
+        if spec is not None:
+            st.vega_lite_chart(spec, use_container_width=True)
+        elif plot_kind == "repeat":
+            st.info("Repeat_Class is missing or empty: barplot not available.")
+        else:
+            st.info("No rows selected: chart not available.")
+
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    lap("charts")
+
+summary_plots()
+
+# -----------------------------------------------------------
+# FAMILY VIEW (aggregates of the families in the current result)
+# -----------------------------------------------------------
+FAMILY_PASS_COLUMNS = ["Conservation PASSED", "Expression PASSED", "Structure PASSED"]
+
+def set_family_expansion(db):
+    if db is None:
+        st.session_state.pop("expand_families", None)
+    else:
+        st.session_state["expand_families"] = db
+
+@partial_rerun
+def family_view():
+    if "families" in ARTIFACTS:
+        expanded = filter_spec["expand_families"]
+        with st.expander("Family view", expanded=bool(expanded)):
+            db = st.radio("Families:", list(FAMILY_SOURCES), horizontal=True, key="family_view_db")
+            family_index = artifact("families", wait=bool(expanded))    # an expanded result needs it now
+            if family_index is None:
+                st.caption("The family index is still being prepared in the background; it appears here when ready.")
+            else:
+                fam = family_index[db]
+
+                codes = fam["codes"][row_ids]
+                in_result = np.bincount(codes[codes >= 0], minlength=len(fam["counts"]))
+                shown = np.flatnonzero(in_result)
+                if not shown.size:
+                    st.info(f"No {db} family members in the current result.")
+                else:
+                    table = fam["aggregates"].iloc[shown].copy()
+                    table.insert(1, "In result", in_result[shown])
+                    table[FAMILY_PASS_COLUMNS] *= 100
+                    st.dataframe(
+                        table,
+                        hide_index=True,
+                        use_container_width=True,
+                        column_config={
+                            c: st.column_config.NumberColumn(c, format="%.0f%%") for c in FAMILY_PASS_COLUMNS
+                        },
+                    )
+                    st.caption(
+                        f"{shown.size} families with {int(in_result.sum())} of their "
+                        f"{int(fam['counts'][shown].sum())} members in the current result."
+                    )
+
+                # the selection changes for the whole page: rerun the app, not only this panel
+                if expanded:
+                    if st.button(f"Undo expansion to {expanded} families", key="family_expand_undo"):
+                        set_family_expansion(None)
+                        st.rerun()
+                elif shown.size:
+                    if st.button("Expand result to whole families", key="family_expand"):
+                        set_family_expansion(db)
+                        st.rerun()
+    lap("families")
+
+family_view()
+
+# -----------------------------------------------------------
+# SIMILAR EXPRESSION PROFILES (nearest neighbours)
+# -----------------------------------------------------------
+@partial_rerun
+def similar_profiles():
+    if "profiles" in ARTIFACTS:
+        with st.expander("Similar expression profiles", expanded=bool(st.session_state.get("nn_query"))):
+            nn_c1, nn_c2, nn_c3 = st.columns([4, 3, 3])
+            with nn_c1:
+                nn_query = st.selectbox(
+                    "miRNA:",
+                    df["miRNA"].tolist(),
+                    index=None,
+                    placeholder="Choose a miRNA (e.g. hsa-mir-145)",
+                    key="nn_query",
+                )
+            with nn_c2:
+                nn_metric = st.radio("Similarity:", NN_METRICS, horizontal=True, key="nn_metric")
+                nn_log = st.checkbox("log(1 + RPMM) transform", value=False, key="nn_log")
+            with nn_c3:
+                st.session_state.setdefault("nn_k", 10)   # default via state: the value may come from the URL
+                nn_k = st.slider("Neighbours (K):", 1, NN_MAX_K, key="nn_k")
+                nn_restrict = st.checkbox("Only within filtered rows", value=False, key="nn_restrict")
+
+            if nn_query:
+                query_pos = int(np.flatnonzero(df["miRNA"].to_numpy() == nn_query)[0])
+                profile_index = artifact("profiles")
+                if profile_index is None:
+                    with st.spinner("Building the expression similarity index…"):
+                        profile_index = artifact("profiles", wait=True)
+
+                nn_pos, nn_sims = nearest_profiles(
+                    profile_index, query_pos, nn_k,
+                    metric=nn_metric, use_log=nn_log, candidates=row_ids if nn_restrict else None,
+                )
+
+                if len(nn_pos) == 0:
+                    st.info("No expression detected for this miRNA (or no candidates left): neighbours not available.")
+                else:
+                    nn_df = df.iloc[nn_pos][[
+                        "miRNA", "Expression_display", "Structure_display",
+                        "miRBase_family_display", "Repeat_Class",
+                    ]].rename(columns={
+                        "Expression_display": "Tissues expressed",
+                        "Structure_display": "Class (miRBase/MirGeneDB)",
+                        "miRBase_family_display": "miRBase family",
+                        "Repeat_Class": "Repeat Class",
+                    })
+                    nn_df.insert(1, "Similarity", np.round(nn_sims, 4))
+                    st.dataframe(nn_df, hide_index=True, use_container_width=True)
+
+    lap("neighbours")
+
+similar_profiles()
+
+# -----------------------------------------------------------
+# DIFF RELEASES (keyed join on miRNA)
+# -----------------------------------------------------------
+# label -> normalized column compared between releases
+DIFF_FIELDS = {
+    "Conservation": "_Conservation_tf",
+    "Expression": "_Expression_tf",
+    "Structure": "_Structure_tf",
+    "Class miRBase": "Class_miRBase",
+    "Class MirGeneDB": "Class_MirGeneDB",
+    "miRBase family": "_miRBase_family_flag",
+    "MirGeneDB family": "_MirGeneDB_family_flag",
+    "miRBase family name": "family_name_mirbase",
+    "MirGeneDB family name": "family_name_mirgene",
+    "Repeat Class": "Repeat_Class",
+}
+DIFF_SOURCE_COLS = [
+    "miRNA", "Conservation", "Expression", "Structure", "Class_miRBase", "Class_MirGeneDB",
+    "miRBase family", "MirGeneDB family", "family_name_mirbase", "family_name_mirgene", "Repeat_Class",
+]
 
-    st.markdown("</div>", unsafe_allow_html=True)
+@st.cache_data(max_entries=RELEASE_CACHE_SIZE, show_spinner="Comparing releases…")
+def release_diff(path_a, version_a, path_b, version_b):
+    """Added / removed miRNAs and per-field changes between two releases."""
+    def keyed(path):
+        data = normalize_table(pd.read_csv(path, usecols=lambda c: c in DIFF_SOURCE_COLS))
+        data = data.dropna(subset=["miRNA"]).drop_duplicates("miRNA")
+        return data[["miRNA"] + list(DIFF_FIELDS.values())].astype("string").fillna("NA")
+
+    joined = keyed(path_a).merge(keyed(path_b), on="miRNA", how="outer", suffixes=("_a", "_b"), indicator=True)
+    added = joined.loc[joined["_merge"] == "right_only", "miRNA"].sort_values().tolist()
+    removed = joined.loc[joined["_merge"] == "left_only", "miRNA"].sort_values().tolist()
+
+    both = joined[joined["_merge"] == "both"]
+    changes = []
+    for label, col in DIFF_FIELDS.items():
+        changed = both[f"{col}_a"] != both[f"{col}_b"]
+        changes.append(pd.DataFrame({
+            "miRNA": both.loc[changed, "miRNA"],
+            "Field": label,
+            "Before": both.loc[changed, f"{col}_a"],
+            "After": both.loc[changed, f"{col}_b"],
+        }))
+    changes = pd.concat(changes, ignore_index=True).sort_values(["miRNA", "Field"], ignore_index=True)
+
+    return {
+        "added": added,
+        "removed": removed,
+        "changes": changes,
+        "n_common": len(both),
+        "n_changed": changes["miRNA"].nunique(),
+    }
+
+@partial_rerun
+def diff_releases():
+    if len(RELEASES) > 1:
+        with st.expander("Diff releases", expanded=False):
+            release_names = list(RELEASES)
+            diff_c1, diff_c2 = st.columns(2)
+            with diff_c1:
+                diff_base = st.selectbox("Base release:", release_names, index=0, key="diff_base")
+            with diff_c2:
+                diff_other = st.selectbox("Compare with:", release_names, index=1, key="diff_other")
+
+            if diff_base == diff_other:
+                st.info("Choose two different releases.")
+            else:
+                diff = release_diff(
+                    RELEASES[diff_base], dataset_version(RELEASES[diff_base]),
+                    RELEASES[diff_other], dataset_version(RELEASES[diff_other]),
+                )
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("Added", len(diff["added"]))
+                m2.metric("Removed", len(diff["removed"]))
+                m3.metric("Changed", diff["n_changed"])
+                m4.metric("Unchanged", diff["n_common"] - diff["n_changed"])
+
+                if not diff["changes"].empty:
+                    st.markdown("**Changes by field**")
+                    st.dataframe(
+                        diff["changes"]["Field"].value_counts().rename_axis("Field").reset_index(name="pre-miRNAs"),
+                        hide_index=True,
+                    )
+                    st.dataframe(diff["changes"], hide_index=True, use_container_width=True)
+
+                added_col, removed_col = st.columns(2)
+                with added_col:
+                    st.markdown(f"**Added in {diff_other}**")
+                    st.dataframe(pd.DataFrame({"miRNA": diff["added"]}), hide_index=True, use_container_width=True)
+                with removed_col:
+                    st.markdown(f"**Removed from {diff_base}**")
+                    st.dataframe(pd.DataFrame({"miRNA": diff["removed"]}), hide_index=True, use_container_width=True)
+
+                diff_report = pd.concat([
+                    pd.DataFrame({"miRNA": diff["added"], "Field": "added"}),
+                    pd.DataFrame({"miRNA": diff["removed"], "Field": "removed"}),
+                    diff["changes"],
+                ], ignore_index=True)
+                st.download_button(
+                    "Download diff (TSV)",
+                    data=diff_report.to_csv(index=False, sep="\t").encode("utf-8"),
+                    file_name=f"diff_{diff_base}_vs_{diff_other}.tsv",
+                    mime="text/tab-separated-values",
+                    key="dl_diff",
+                )
+
+    lap("diff")
+
+diff_releases()
+
+# -----------------------------------------------------------
+# DEBUG PANEL (stage timings, rolling per-session history)
+# -----------------------------------------------------------
+def record_stage_history(rows, table_payload=None):
+    """Append the stage timings of this run (whole script or one fragment) to the session history.
+
+    `table_payload` is (display mode, bytes) of the table sent in this run, if any.
+    """
+    history = st.session_state.setdefault("_stage_history", deque(maxlen=STAGE_HISTORY_LEN))
+    history.append({
+        "ts": time.time(),
+        "rows": int(rows),
+        "table": None if table_payload is None else {"mode": table_payload[0], "bytes": table_payload[1]},
+        "stages_ms": {k: round(v * 1000, 3) for k, v in stage_timings.items()},
+        "total_ms": round(sum(stage_timings.values()) * 1000, 3),
+    })
+    return history
+
+if DEBUG_TIMINGS:
+    history = record_stage_history(
+        n_filtered, ("grid" if table_view["grid"] else "html", table_artifacts["payload_bytes"]),
+    )
+
+    with st.expander("Debug: stage timings", expanded=True):
+        stages = list(dict.fromkeys(k for run in history for k in run["stages_ms"]))
+        timing_rows = []
+        for name in stages + ["total"]:
+            values = np.array([
+                run["total_ms"] if name == "total" else run["stages_ms"].get(name, 0.0)
+                for run in history
+            ])
+            timing_rows.append({
+                "Stage": name,
+                "Last (ms)": round(float(values[-1]), 2),
+                "p50 (ms)": round(float(np.percentile(values, 50)), 2),
+                "p95 (ms)": round(float(np.percentile(values, 95)), 2),
+            })
+        st.caption(
+            f"{len(history)} rerun(s) in this session (last {STAGE_HISTORY_LEN} kept); "
+            f"table payload: {table_artifacts['payload_bytes'] / 1024:,.0f} KB "
+            f"({TABLE_MODES['grid' if table_view['grid'] else 'html']})"
+        )
+        st.dataframe(pd.DataFrame(timing_rows), hide_index=True, use_container_width=True)
+
+        with QUERY_CACHE["lock"]:
+            cache_stats = {k: QUERY_CACHE[k] for k in ("hits", "misses", "evictions", "bytes")}
+            cache_stats["entries"] = len(QUERY_CACHE["entries"])
+        lookups = cache_stats["hits"] + cache_stats["misses"]
+        st.caption(
+            f"Query cache (all sessions): {cache_stats['entries']} entries, "
+            f"{cache_stats['bytes'] / 2**20:.1f} of {QUERY_CACHE_BYTES / 2**20:.0f} MB, "
+            f"{cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['hits'] / max(lookups, 1):.0%} hit rate), {cache_stats['evictions']} evictions"
+        )
+        st.download_button(
+            "Download timing history (JSON)",
+            data=json.dumps(list(history), indent=1).encode("utf-8"),
+            file_name="stage_timings.json",
+            mime="application/json",
+            key="dl_timings",
+        )
+
+# -----------------------------------------------------------
+# URL STATE SYNC + PRESET WARM-UP
+# -----------------------------------------------------------
+def sync_query_params():
+    """Mirror the widget state into the URL (end of the script and of every fragment rerun)."""
+    url_params = state_to_query(st.session_state)
+    if len(RELEASES) > 1 and release != next(iter(RELEASES)):
+        url_params["release"] = release
+    if "debug" in st.query_params:
+        url_params["debug"] = st.query_params["debug"]
+    current_params = {k: st.query_params.get_all(k) for k in st.query_params}
+    if {k: v if isinstance(v, list) else [v] for k, v in url_params.items()} != current_params:
+        st.query_params.from_dict(url_params)
+
+sync_query_params()
+
+def warm_presets(cache, store, path, version, large):
+    """Precompute row ids, rendered table and FASTA of every preset (background thread)."""
+    page = 1 if large else None
+    for preset in PRESETS.values():
+        spec = filter_spec_from_state(preset["state"])
+        key = canonical_spec(spec)
+        ids = filter_rows(store, spec)
+        ids.setflags(write=False)
+        cache_put(cache, ("rows", path, key), version, ids)
+
+        page_ids = ids[:PAGE_SIZE] if large else ids
+        view = table_view_from_state(preset["state"], page)
+        cache_put(cache, ("table", path, key, json.dumps(view, sort_keys=True)), version, build_table_artifacts(page_ids, view))
+        cache_put(cache, ("fasta", path, key, page, False, None), version, generate_fasta(page_ids).encode("utf-8"))
+
+@st.cache_resource(max_entries=RELEASE_CACHE_SIZE, show_spinner=False)
+def start_preset_warmup(path, version, _warm):
+    """Runs once per release version, after the first page of the first session is drawn."""
+    thread = threading.Thread(target=_warm, name=f"preset-warmup-{Path(path).name}", daemon=True)
+    thread.start()
+    return thread
+
+def start_artifacts():
+    """Queue every registered artifact of the current table (no-op for the ones already queued)."""
+    for name in ARTIFACTS:
+        artifact_future(name)
+
+start_artifacts()
+start_preset_warmup(
+    DATA_FILE, DATA_VERSION,
+    lambda: warm_presets(QUERY_CACHE, STORE, DATA_FILE, DATA_VERSION, LARGE_MODE),
+)
 
 # -----------------------------------------------------------
 # FOOTER
@@ -1646,3 +4491,5 @@ if show_repeat_plot:
 st.markdown("---")
 st.caption("pre-miRNA Annotation Browser — Streamlit App")
 
+FULL_RUN = False
+
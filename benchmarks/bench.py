@@ -0,0 +1,262 @@
+"""
+Benchmark suite for the hot paths of app.py.
+
+Drives the real script headlessly (Streamlit AppTest, no browser) with the
+stage timings of the debug panel enabled (?debug=1), so every case reports
+the same named stages: load, preprocess, indexes, filter, search, display,
+styler, to_html, arrow, render, tsv, fasta, charts, ... Cases that draw the
+table also report its payload (HTML text or Arrow stream bytes).
+
+Each case presets the widget state of one sidebar filter family (or view),
+reruns the script `--repeat` times and keeps the median per stage. Cases run
+on sfile2_NEW_plusFam.csv (scale 1) and on synthetic tables built by
+replicating its rows (scale 10, 100, 1000).
+
+The process-wide query cache is disabled (MIRRF_QUERY_CACHE_MB=0), so every
+repeat filters, renders and exports again instead of reusing the results of
+the first one. `--app` measures another version of the script, e.g. one
+written with `git show <rev>:app.py > _app_prev.py` next to app.py.
+
+Usage:
+    python benchmarks/bench.py [--app app.py] [--scales 1 10 100 1000] [--cases default search ...]
+                               [--repeat 3] [--label NAME]
+    python benchmarks/bench.py --compare results/bench-a.json results/bench-b.json
+
+Results are written to benchmarks/results/bench-<label>.json.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / "app.py"
+DATA = ROOT / "sfile2_NEW_plusFam.csv"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+SCALED_DIR = Path(tempfile.gettempdir()) / "mirrf-bench"
+
+SPECIES_ALL = [
+    "P. troglodytes", "P. paniscus", "M. mulatta", "L. catta", "F. catus", "S. scrofa",
+    "B. taurus", "M. musculus", "G. gallus", "X. tropicalis", "D. rerio", "T. rubripes",
+]
+SYSTEMS_ALL = [
+    "Cardiorespiratory", "Digestive & Metabolic", "Neuro-Endocrine", "Immune / Hematolymphoid",
+    "Musculoskeletal & Integumentary", "Urogenital & Reproductive", "Others",
+]
+
+# case name -> session state preset (widget keys of app.py)
+CASES = {
+    "default": {},
+    "pass_fail": {"sb_conservation": "PASSED", "sb_expression": "PASSED", "sb_structure": "PASSED"},
+    "hsa": {"sb_hsa": "Only hsa-specific"},
+    "family": {"ms_family": ["miRNAs in family – miRBase", "Single miRNAs – MirGeneDB"]},
+    "repeat": {"ms_repeat": ["LINE", "SINE", "DNA"]},
+    "species": {
+        "show_adv": True,
+        "cons_species_found": ["M. musculus"],
+        "cons_stability_choice": "Stable (R/D)",
+        "cons_species_na": ["D. rerio"],
+    },
+    "tissues": {
+        "show_adv": True,
+        "tree_pos_1. Cardiorespiratory system": ["heart", "artery", "vein"],
+        "tree_neg_3. Neuro-Endocrine system": ["brain"],
+    },
+    "db_class": {"show_adv": True, "db_filter": "In both", "class_filter": ["R", "D"]},
+    "search": {"search_any": "mir-1"},
+    "full_view": {
+        "show_adv": True,
+        "show_species_cols": SPECIES_ALL,
+        "show_tissue_systems": SYSTEMS_ALL,
+        "show_class_cols": True,
+    },
+    "full_view_grid": {
+        "show_adv": True,
+        "show_species_cols": SPECIES_ALL,
+        "show_tissue_systems": SYSTEMS_ALL,
+        "show_class_cols": True,
+        "table_mode": "grid",
+    },
+    "sequence": {
+        "show_adv": True,
+        "show_seq_features": ["length", "gc", "homopolymer", "dust"],
+        "seq_filter": ["gc", "dust"],
+        "seq_range_gc": (40.0, 60.0),
+        "seq_range_dust": (0.0, 1.5),
+        "seq_sort": "homopolymer",
+        "seq_sort_desc": True,
+    },
+    "charts": {
+        "show_repeat_plot": True,
+        "show_species_plot": True,
+        "show_breadth_plot": True,
+        "show_system_plot": True,
+    },
+}
+
+
+def scaled_table(scale: int) -> Path:
+    """sfile2_NEW_plusFam.csv replicated `scale` times, with unique miRNA names."""
+    if scale == 1:
+        return DATA
+    SCALED_DIR.mkdir(parents=True, exist_ok=True)
+    path = SCALED_DIR / f"sfile2_x{scale}.csv"
+    if path.exists() and path.stat().st_mtime >= DATA.stat().st_mtime:
+        return path
+
+    import pandas as pd
+
+    base = pd.read_csv(DATA)
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        for i in range(scale):
+            part = base.copy()
+            if i:
+                part["miRNA"] = part["miRNA"] + f"-x{i}"
+            part.to_csv(fh, index=False, header=(i == 0))
+    return path
+
+
+def run_case(app: Path, preset: dict, repeat: int, cold: bool = False) -> dict:
+    """Median stage timings (ms) over `repeat` reruns of one preset."""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    if cold:
+        st.cache_data.clear()
+        st.cache_resource.clear()
+
+    at = AppTest.from_file(str(app), default_timeout=3600)
+    at.query_params["debug"] = "1"
+    for key, value in preset.items():
+        at.session_state[key] = value
+
+    t0 = time.perf_counter()
+    for _ in range(1 if cold else repeat):
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    wall = time.perf_counter() - t0
+
+    history = list(at.session_state["_stage_history"])
+    stages = list(dict.fromkeys(k for run in history for k in run["stages_ms"]))
+    return {
+        "rows_shown": history[-1]["rows"],
+        "table": history[-1].get("table"),
+        "runs": len(history),
+        "wall_s": round(wall, 3),
+        "stages_ms": {
+            k: round(statistics.median(run["stages_ms"].get(k, 0.0) for run in history), 3)
+            for k in stages
+        },
+        "total_ms": round(statistics.median(run["total_ms"] for run in history), 3),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def run_suite(app, scales, cases, repeat, label):
+    import numpy
+    import pandas
+    import streamlit
+
+    os.chdir(ROOT)
+    os.environ["MIRRF_QUERY_CACHE_MB"] = "0"
+    result = {
+        "label": label,
+        "commit": git_commit(),
+        "app": str(app.relative_to(ROOT)) if app.is_relative_to(ROOT) else str(app),
+        "query_cache": False,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "versions": {"pandas": pandas.__version__, "numpy": numpy.__version__, "streamlit": streamlit.__version__},
+        "repeat": repeat,
+        "scales": {},
+    }
+
+    for scale in scales:
+        path = scaled_table(scale)
+        os.environ["MIRRF_DATA"] = str(path)
+        scale_res = {"data": path.name, "cases": {}}
+
+        print(f"\n== scale x{scale} ({path.name})")
+        cold = run_case(app, {}, 1, cold=True)
+        scale_res["cases"]["cold_load"] = cold
+        scale_res["rows"] = cold["rows_shown"]
+        print(f"  {'cold_load':<12} {cold['total_ms']:10.1f} ms  "
+              f"(load {cold['stages_ms'].get('load', 0):.1f}, preprocess {cold['stages_ms'].get('preprocess', 0):.1f}, "
+              f"indexes {cold['stages_ms'].get('indexes', 0):.1f})")
+
+        for name in cases:
+            res = run_case(app, CASES[name], repeat)
+            scale_res["cases"][name] = res
+            top = sorted(res["stages_ms"].items(), key=lambda kv: -kv[1])[:3]
+            payload = f"  payload {res['table']['bytes'] / 1024:,.0f} KB ({res['table']['mode']})" if res.get("table") else ""
+            print(f"  {name:<12} {res['total_ms']:10.1f} ms  rows={res['rows_shown']:<8} "
+                  + ", ".join(f"{k} {v:.1f}" for k, v in top) + payload)
+
+        result["scales"][str(scale)] = scale_res
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out = RESULTS_DIR / f"bench-{label}.json"
+    out.write_text(json.dumps(result, indent=1) + "\n")
+    print(f"\nresults written to {out.relative_to(ROOT)}")
+
+
+def compare(path_a, path_b):
+    a = json.loads(Path(path_a).read_text())
+    b = json.loads(Path(path_b).read_text())
+    print(f"{a['label']} ({a['commit']}, {a.get('app', 'app.py')})  ->  {b['label']} ({b['commit']}, {b.get('app', 'app.py')})")
+    for scale in a["scales"]:
+        if scale not in b["scales"]:
+            continue
+        print(f"\n== scale x{scale}")
+        print(f"  {'case':<12} {'stage':<12} {'before ms':>11} {'after ms':>11} {'ratio':>7}")
+        for case, ra in a["scales"][scale]["cases"].items():
+            rb = b["scales"][scale]["cases"].get(case)
+            if rb is None:
+                continue
+            stages = list(dict.fromkeys(list(ra["stages_ms"]) + list(rb["stages_ms"]))) + ["total"]
+            for stage in stages:
+                va = ra["total_ms"] if stage == "total" else ra["stages_ms"].get(stage, 0.0)
+                vb = rb["total_ms"] if stage == "total" else rb["stages_ms"].get(stage, 0.0)
+                if max(va, vb) < 1.0 and stage != "total":
+                    continue
+                ratio = f"{vb / va:6.2f}x" if va else "     -"
+                print(f"  {case:<12} {stage:<12} {va:11.1f} {vb:11.1f} {ratio:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default=str(APP))
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--label", default=None, help="results name (default: current git commit)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    warnings.filterwarnings("ignore")
+    logging.disable(logging.WARNING)
+    run_suite(Path(args.app).resolve(), args.scales, args.cases, args.repeat, args.label or git_commit())
+
+
+if __name__ == "__main__":
+    main()
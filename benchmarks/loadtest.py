@@ -0,0 +1,243 @@
+"""
+Multi-session load test for app.py (one replica, no browser, no network).
+
+N sessions (Streamlit AppTest instances, one per thread) share one process,
+and so share every process-wide cache, like the sessions of a real replica.
+Each session replays interaction scripts in a loop:
+
+  * the README use cases (preset buttons, then showing / hiding columns),
+  * typing a query into "Search any column", one key per rerun,
+  * turning on the advanced options and showing every tissue system in turn.
+
+AppTest installs a process-global runtime for the duration of a run, so runs
+execute one at a time; a session waiting for another one's rerun counts that
+wait in its latency, as on a replica whose script threads share one CPU.
+
+Reported per number of sessions:
+
+  * rerun latency percentiles (p50 / p90 / p99, including the wait),
+  * CPU time per rerun and reruns per second,
+  * resident memory (RSS) after one warm session and with all N sessions
+    alive, and the increase per added session,
+  * with --trace: memory kept per session. Once every session has finished,
+    each one reruns its last page under tracemalloc; what those reruns
+    allocated and is still alive afterwards is what the server keeps for a
+    session. The element tree AppTest keeps for each session, i.e. the page
+    the browser would hold, is dropped first. Tracing stays off during the
+    timed reruns.
+
+Every N runs in a fresh process. The table is MIRRF_DATA / the default table.
+
+Usage:
+    python benchmarks/loadtest.py [--app app.py] [--sessions 1 5 10 20] [--rounds 2] [--think 0.2]
+                                  [--no-query-cache] [--trace] [--label NAME]
+
+Results are written to benchmarks/results/loadtest-<label>.json.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bench import APP, RESULTS_DIR, ROOT, SYSTEMS_ALL  # noqa: E402
+
+SEARCH_TYPED = "mir-145"
+
+# script name -> list of (action, target, value); each step is one rerun
+SCRIPTS = {
+    "readme_cardio": [
+        ("click", "preset_cardio-mouse", None),
+        ("multiselect", "show_species_cols", ["M. musculus", "P. troglodytes"]),
+        ("checkbox", "group_hairpins", True),
+        ("checkbox", "group_hairpins", False),
+    ],
+    "readme_brain": [
+        ("click", "preset_brain-primates", None),
+        ("selectbox", "sb_hsa", "Only hsa-specific"),
+        ("selectbox", "sb_hsa", "Show all"),
+    ],
+    "search_typing": [
+        ("text", "search_any", SEARCH_TYPED[:i]) for i in range(1, len(SEARCH_TYPED) + 1)
+    ] + [("text", "search_any", "")],
+    "tissue_systems": [("toggle", "show_adv", True)] + [
+        ("multiselect", "show_tissue_systems", SYSTEMS_ALL[:i]) for i in range(1, len(SYSTEMS_ALL) + 1)
+    ] + [("multiselect", "show_tissue_systems", []), ("toggle", "show_adv", False)],
+}
+
+CHILD = r"""
+import gc, json, logging, random, statistics, sys, threading, time, tracemalloc, warnings
+warnings.filterwarnings("ignore"); logging.disable(logging.WARNING)
+from streamlit.testing.v1 import AppTest
+
+app, n_sessions, rounds, think, scripts = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), float(sys.argv[4]), json.loads(sys.argv[5])
+trace = sys.argv[6] == "1"
+
+def rss_mb():
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+run_lock = threading.Lock()
+samples = []            # (latency s, cpu s)
+errors = []
+
+def rerun(at, step):
+    action, target, value = step
+    t0 = time.perf_counter()
+    with run_lock:
+        c0 = time.process_time()
+        if action == "click":
+            at.button(key=target).click()
+        elif action == "text":
+            at.text_input(key=target).input(value)
+        else:
+            getattr(at, action)(key=target).set_value(value)
+        at.run()
+        cpu = time.process_time() - c0
+    samples.append((time.perf_counter() - t0, cpu))
+    if at.exception:
+        errors.append(at.exception[0].message)
+
+def new_session():
+    at = AppTest.from_file(app, default_timeout=3600)
+    with run_lock:
+        at.run()
+    return at
+
+warm = new_session()                  # fills the data caches; then one warm session is the baseline
+rss_one = rss_mb()
+
+sessions = [warm] + [None] * (n_sessions - 1)
+ready = threading.Barrier(n_sessions)
+
+def session(i):
+    rng = random.Random(i)
+    if sessions[i] is None:
+        sessions[i] = new_session()
+    ready.wait()
+    at = sessions[i]
+    names = list(scripts)
+    rng.shuffle(names)
+    for _ in range(rounds):
+        for name in names:
+            for step in scripts[name]:
+                rerun(at, step)
+                time.sleep(rng.uniform(0, 2 * think))
+
+threads = [threading.Thread(target=session, args=(i,)) for i in range(n_sessions)]
+t0 = time.perf_counter()
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+wall = time.perf_counter() - t0
+rss_all = rss_mb()
+
+retained = None
+if trace:
+    gc.collect()
+    tracemalloc.start()
+    for at in sessions:
+        at.run()                # replaces everything the session kept from its previous rerun
+        at._tree = None         # the rendered page: held by the browser, not by the server
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+print(json.dumps({
+    "latency_s": [s[0] for s in samples],
+    "cpu_s": [s[1] for s in samples],
+    "wall_s": wall,
+    "rss_one_mb": rss_one,
+    "rss_all_mb": rss_all,
+    "retained_bytes": retained,
+    "errors": errors[:5],
+}))
+"""
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def load_run(app: Path, n_sessions: int, rounds: int, think: float, query_cache: bool, trace: bool) -> dict:
+    env = dict(os.environ)
+    env["MIRRF_WATCH_SECONDS"] = "0"
+    if not query_cache:
+        env["MIRRF_QUERY_CACHE_MB"] = "0"
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD, str(app), str(n_sessions), str(rounds), str(think), json.dumps(SCRIPTS),
+         "1" if trace else "0"],
+        capture_output=True, text=True, cwd=ROOT, env=env, check=True,
+    )
+    raw = json.loads(proc.stdout.strip().splitlines()[-1])
+    lat_ms = [v * 1000 for v in raw["latency_s"]]
+    cpu_ms = [v * 1000 for v in raw["cpu_s"]]
+    extra = raw["rss_all_mb"] - raw["rss_one_mb"]
+    return {
+        "sessions": n_sessions,
+        "reruns": len(lat_ms),
+        "reruns_per_s": round(len(lat_ms) / raw["wall_s"], 2),
+        "latency_ms": {q: round(percentile(lat_ms, int(q[1:])), 1) for q in ("p50", "p90", "p99")},
+        "cpu_ms": {"mean": round(statistics.mean(cpu_ms), 1), "p50": round(percentile(cpu_ms, 50), 1)},
+        "rss_mb": {
+            "one_session": round(raw["rss_one_mb"], 1),
+            "all_sessions": round(raw["rss_all_mb"], 1),
+            "per_added_session": round(extra / (n_sessions - 1), 2) if n_sessions > 1 else None,
+        },
+        "retained_mb_per_session": (
+            None if raw["retained_bytes"] is None else round(raw["retained_bytes"] / n_sessions / 2**20, 3)
+        ),
+        "errors": raw["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default=str(APP))
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--rounds", type=int, default=2, help="times each session replays every script")
+    parser.add_argument("--think", type=float, default=0.2, help="mean pause between two interactions (s)")
+    parser.add_argument("--no-query-cache", action="store_true")
+    parser.add_argument("--trace", action="store_true", help="also report traced memory retained per session")
+    parser.add_argument("--label", default="current")
+    args = parser.parse_args()
+
+    app = Path(args.app).resolve()
+    result = {
+        "label": args.label,
+        "app": str(app.relative_to(ROOT)) if app.is_relative_to(ROOT) else str(app),
+        "rounds": args.rounds,
+        "think_s": args.think,
+        "query_cache": not args.no_query_cache,
+        "scripts": {name: len(steps) for name, steps in SCRIPTS.items()},
+        "runs": [],
+    }
+    print(f"{'sessions':>8} {'reruns':>7} {'rerun/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+          f"{'cpu ms':>7} {'RSS MB':>8} {'MB/session':>11}" + (f" {'kept/session':>13}" if args.trace else ""))
+    for n in args.sessions:
+        res = load_run(app, n, args.rounds, args.think, not args.no_query_cache, args.trace)
+        result["runs"].append(res)
+        per = res["rss_mb"]["per_added_session"]
+        print(f"{n:>8} {res['reruns']:>7} {res['reruns_per_s']:>8.1f} {res['latency_ms']['p50']:>8.1f} "
+              f"{res['latency_ms']['p90']:>8.1f} {res['latency_ms']['p99']:>8.1f} {res['cpu_ms']['mean']:>7.1f} "
+              f"{res['rss_mb']['all_sessions']:>8.1f} {'-' if per is None else f'{per:.2f}':>11}"
+              + (f" {res['retained_mb_per_session']:>10.3f} MB" if args.trace else ""))
+        for message in res["errors"]:
+            print(f"    error: {message}")
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out = RESULTS_DIR / f"loadtest-{args.label}.json"
+    out.write_text(json.dumps(result, indent=1) + "\n")
+    print(f"\nresults written to {out.relative_to(ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Memory benchmark for one rerun of app.py.
+
+For each case of bench.py (a widget preset), the script is run once to warm
+the data caches, then rerun under tracemalloc with the query cache disabled
+(MIRRF_QUERY_CACHE_MB=0), so filtering, search, table display and the TSV /
+FASTA exports are really computed. Reported per case and rerun:
+
+  * peak: highest memory allocated during the rerun, above the level before it,
+  * retained: memory still allocated once the rerun has finished.
+
+Each app runs in its own process, so an older version of the script can be
+measured against the current one.
+
+Usage:
+    python benchmarks/memory.py [--app app.py] [--scales 1 10] [--cases default full_view ...]
+                                [--repeat 3] [--label NAME]
+    python benchmarks/memory.py --compare results/memory-a.json results/memory-b.json
+
+Results are written to benchmarks/results/memory-<label>.json.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bench import CASES, RESULTS_DIR, ROOT, scaled_table  # noqa: E402
+
+CHILD = """
+import json, logging, sys, tracemalloc, warnings
+warnings.filterwarnings("ignore"); logging.disable(logging.WARNING)
+from streamlit.testing.v1 import AppTest
+
+app, preset, repeat = sys.argv[1], json.loads(sys.argv[2]), int(sys.argv[3])
+at = AppTest.from_file(app, default_timeout=3600)
+for key, value in preset.items():
+    at.session_state[key] = value
+at.run()                                    # warm the data caches
+assert not at.exception, at.exception[0].message
+
+tracemalloc.start()
+runs = []
+for _ in range(repeat):
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    at.run()
+    assert not at.exception, at.exception[0].message
+    current, peak = tracemalloc.get_traced_memory()
+    runs.append({"peak": peak - before, "retained": current - before})
+print(json.dumps(runs))
+"""
+
+
+def measure(app: Path, data: Path, preset: dict, repeat: int) -> dict:
+    """Median peak / retained MB of `repeat` reruns of one preset, in a fresh process."""
+    env = {**os.environ, "MIRRF_DATA": str(data), "MIRRF_QUERY_CACHE_MB": "0"}
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD, str(app), json.dumps(preset), str(repeat)],
+        capture_output=True, text=True, cwd=app.parent, env=env, check=True,
+    )
+    runs = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {
+        "peak_mb": round(statistics.median(r["peak"] for r in runs) / 2**20, 2),
+        "retained_mb": round(statistics.median(r["retained"] for r in runs) / 2**20, 2),
+    }
+
+
+def compare(path_a, path_b):
+    a = json.loads(Path(path_a).read_text())
+    b = json.loads(Path(path_b).read_text())
+    print(f"{a['label']} ({a['app']})  ->  {b['label']} ({b['app']})")
+    for scale in a["scales"]:
+        if scale not in b["scales"]:
+            continue
+        print(f"\n== scale x{scale}")
+        print(f"  {'case':<16} {'peak before':>12} {'peak after':>11} {'retained before':>16} {'retained after':>15}")
+        for case, ra in a["scales"][scale].items():
+            rb = b["scales"][scale].get(case)
+            if rb is None:
+                continue
+            print(f"  {case:<16} {ra['peak_mb']:10.1f}MB {rb['peak_mb']:9.1f}MB "
+                  f"{ra['retained_mb']:14.1f}MB {rb['retained_mb']:13.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default=str(ROOT / "app.py"))
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--cases", nargs="+", default=["default", "search", "full_view", "full_view_grid"],
+                        choices=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--label", default="current")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    app = Path(args.app).resolve()
+    result = {
+        "label": args.label,
+        "app": str(app.relative_to(ROOT)) if app.is_relative_to(ROOT) else str(app),
+        "repeat": args.repeat,
+        "scales": {},
+    }
+    for scale in args.scales:
+        data = scaled_table(scale)
+        print(f"\n== scale x{scale} ({data.name})")
+        result["scales"][str(scale)] = {}
+        for name in args.cases:
+            res = measure(app, data, CASES[name], args.repeat)
+            result["scales"][str(scale)][name] = res
+            print(f"  {name:<16} peak {res['peak_mb']:8.1f} MB   retained {res['retained_mb']:8.1f} MB")
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out = RESULTS_DIR / f"memory-{args.label}.json"
+    out.write_text(json.dumps(result, indent=1) + "\n")
+    print(f"\nresults written to {out.relative_to(ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
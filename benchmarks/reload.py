@@ -0,0 +1,85 @@
+"""
+Hot-reload benchmark: time to pick up an edited table.
+
+A copy of the (scaled) table is loaded by app.py, then `--edits` rows are
+changed on disk and the script is rerun (MIRRF_WATCH_SECONDS=0, so the
+rerun itself checks the file). Reported per scale, in ms:
+
+  * cold: first load of the table (every row prepared and encoded),
+  * reload: the rerun after the edit (only changed rows prepared / encoded),
+  * indexes: per-release indexes rebuilt for the new version on that rerun.
+
+Usage:
+    python benchmarks/reload.py [--scales 1 10 100] [--edits 1 100]
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import warnings
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bench import APP, ROOT, scaled_table  # noqa: E402
+
+
+def run(at):
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return at.session_state["_stage_history"][-1]["stages_ms"]
+
+
+def edit_rows(path, n, seed):
+    """Rewrite `path` with the Repeat_Class of `n` random rows swapped (levels stay the same)."""
+    import numpy as np
+    import pandas as pd
+
+    data = pd.read_csv(path)
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(data), size=n, replace=False)
+    data.loc[rows, "Repeat_Class"] = data["Repeat_Class"].to_numpy()[rng.permutation(rows)]
+    data.loc[rows[0], "hsa-specificity"] = "YES" if data.loc[rows[0], "hsa-specificity"] != "YES" else "NO"
+    data.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--edits", type=int, nargs="+", default=[1, 100])
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    logging.disable(logging.WARNING)
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    os.chdir(ROOT)
+    os.environ["MIRRF_WATCH_SECONDS"] = "0"
+    work = Path(tempfile.mkdtemp(prefix="mirrf-reload-"))
+    try:
+        for scale in args.scales:
+            path = work / scaled_table(scale).name
+            shutil.copyfile(scaled_table(scale), path)
+            os.environ["MIRRF_DATA"] = str(path)
+            st.cache_data.clear()
+            st.cache_resource.clear()
+
+            at = AppTest.from_file(str(APP), default_timeout=3600)
+            at.query_params["debug"] = "1"
+            cold = run(at)
+            print(f"\n== scale x{scale} ({path.name})")
+            print(f"  {'cold':<14} load {cold['load']:10.1f} ms   indexes {cold.get('indexes', 0):8.1f} ms")
+            for i, n in enumerate(args.edits):
+                edit_rows(path, n, seed=i)
+                stages = run(at)
+                print(f"  {f'{n} rows edited':<14} load {stages['load']:10.1f} ms   "
+                      f"indexes {stages.get('indexes', 0):8.1f} ms")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Startup benchmark for app.py.
+
+Reports
+  * the eager (module-level) imports of app.py, with an `-X importtime`
+    breakdown measured in a fresh interpreter,
+  * the cost of the lazily imported modules (paid only when their feature is used),
+  * in a new process (Streamlit AppTest, headless, no browser): the time until
+    the page title is drawn ("first paint") and until the first run completes.
+
+Usage:
+    python benchmarks/startup.py [--app app.py] [--label NAME] [--repeat 5] [--no-run]
+
+Results are written to benchmarks/results/startup-<label>.json and the raw
+importtime report to benchmarks/results/importtime-<label>.txt.
+"""
+import argparse
+import ast
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+LAZY_IMPORTS = ["import altair", "from PIL import Image"]
+
+
+def eager_imports(app_path: Path) -> list:
+    """Import statements executed at module level of the script (not inside functions)."""
+    tree = ast.parse(app_path.read_text(encoding="utf-8"))
+    return [
+        ast.unparse(node) for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    ]
+
+
+def importtime(statements: list) -> tuple:
+    """(total_us, {top-level module: cumulative_us}, raw report) in a fresh interpreter."""
+    code = "; ".join(statements) or "pass"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=ROOT, check=True,
+    )
+    per_module = {}
+    total = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if name.startswith(" ") and not name.startswith("  "):   # top level: one space
+            try:
+                us = int(cumulative.strip())
+            except ValueError:
+                continue
+            per_module[name.strip()] = us
+            total += us
+    return total, per_module, proc.stderr
+
+
+def cold_first_run(app_path: Path) -> tuple:
+    """(first_paint_s, first_run_s) for the first script run in a brand-new process.
+
+    First paint is when the script draws its title; both are measured from the
+    start of the script run, so the test harness import is excluded.
+    """
+    code = (
+        "import time, logging; logging.disable(logging.WARNING)\n"
+        "import streamlit as st\n"
+        "from streamlit.testing.v1 import AppTest\n"
+        "marks = {}\n"
+        "_title = st.title\n"
+        "def title(*a, **k):\n"
+        "    marks.setdefault('paint', time.perf_counter())\n"
+        "    return _title(*a, **k)\n"
+        "st.title = title\n"
+        f"at = AppTest.from_file({str(app_path)!r}, default_timeout=600)\n"
+        "t0 = time.perf_counter()\n"
+        "at.run()\n"
+        "t1 = time.perf_counter()\n"
+        "assert not at.exception, at.exception\n"
+        "print(marks.get('paint', t1) - t0, t1 - t0)\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code],
+        capture_output=True, text=True, cwd=app_path.parent, check=True,
+    )
+    paint, total = proc.stdout.strip().splitlines()[-1].split()
+    return float(paint), float(total)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default=str(ROOT / "app.py"))
+    parser.add_argument("--label", default="current")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-run", action="store_true", help="skip the cold first-run measurement")
+    args = parser.parse_args()
+
+    app_path = Path(args.app).resolve()
+    modules = eager_imports(app_path)
+
+    runs = [importtime(modules) for _ in range(args.repeat)]
+    totals = [r[0] / 1000 for r in runs]
+    best = min(runs, key=lambda r: r[0])
+
+    lazy = {stmt: importtime([stmt])[0] / 1000 for stmt in LAZY_IMPORTS if stmt not in modules}
+
+    result = {
+        "label": args.label,
+        "app": str(app_path.relative_to(ROOT)) if app_path.is_relative_to(ROOT) else str(app_path),
+        "python": sys.version.split()[0],
+        "eager_imports": modules,
+        "eager_import_ms": {"median": statistics.median(totals), "min": min(totals)},
+        "eager_import_ms_by_module": {k: v / 1000 for k, v in sorted(best[1].items(), key=lambda kv: -kv[1])},
+        "deferred_import_ms": lazy,
+    }
+    if not args.no_run:
+        runs = [cold_first_run(app_path) for _ in range(args.repeat)]
+        paint = [r[0] for r in runs]
+        first = [r[1] for r in runs]
+        result["first_paint_s"] = {"median": statistics.median(paint), "min": min(paint)}
+        result["cold_first_run_s"] = {"median": statistics.median(first), "min": min(first)}
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    (RESULTS_DIR / f"startup-{args.label}.json").write_text(json.dumps(result, indent=2) + "\n")
+    (RESULTS_DIR / f"importtime-{args.label}.txt").write_text(best[2])
+
+    print(f"eager imports: {'; '.join(modules)}")
+    print(f"eager import time: {result['eager_import_ms']['median']:.1f} ms (median of {args.repeat})")
+    for mod, ms in list(result["eager_import_ms_by_module"].items())[:10]:
+        print(f"  {mod:<40} {ms:8.1f} ms")
+    for stmt, ms in lazy.items():
+        print(f"deferred: {stmt:<30} {ms:8.1f} ms")
+    if "cold_first_run_s" in result:
+        print(f"first paint: {result['first_paint_s']['median']:.3f} s (median of {args.repeat})")
+        print(f"cold first run: {result['cold_first_run_s']['median']:.2f} s (median of {args.repeat})")
+
+
+if __name__ == "__main__":
+    main()
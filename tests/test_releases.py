@@ -0,0 +1,70 @@
+"""Release switching and the per-release file watchers."""
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def watchers():
+    return {t.name for t in threading.enumerate() if t.name.startswith("release-watch-")}
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    """The app with a second release ("other") next to the bundled table; one release cached at a time."""
+    table = pd.read_csv(ROOT / "sfile2_NEW_plusFam.csv")
+    (tmp_path / "releases").mkdir()
+    table.iloc[:500].to_csv(tmp_path / "releases" / "other.csv", index=False)
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setenv("MIRRF_RELEASES", str(tmp_path / "releases"))
+    monkeypatch.setenv("MIRRF_RELEASE_CACHE", "1")
+    monkeypatch.setenv("MIRRF_WATCH_SECONDS", "0.1")
+    st.cache_resource.clear()
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=600)
+    yield at
+    st.cache_resource.clear()
+
+
+def run(at):
+    at.run()
+    assert not at.exception, at.exception[0].message
+
+
+def test_switching_release_is_not_an_update(app):
+    run(app)
+    app.selectbox(key="release").select("other")
+    run(app)
+    app.selectbox(key="release").select(app.selectbox(key="release").options[0])
+    run(app)
+    assert not app.toast
+
+
+def test_evicted_release_stops_watching(app):
+    run(app)
+    assert "release-watch-sfile2_NEW_plusFam.csv" in watchers()
+    app.selectbox(key="release").select("other")
+    run(app)
+    deadline = time.monotonic() + 5
+    while "release-watch-sfile2_NEW_plusFam.csv" in watchers() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert watchers() == {"release-watch-other.csv"}
+
+
+def test_edited_release_is_picked_up_on_the_next_rerun(app, tmp_path):
+    run(app)
+    app.selectbox(key="release").select("other")
+    run(app)
+    other = tmp_path / "releases" / "other.csv"
+    table = pd.read_csv(other)
+    table.iloc[:400].to_csv(other, index=False)
+    deadline = time.monotonic() + 10
+    while not app.toast and time.monotonic() < deadline:
+        time.sleep(0.3)
+        run(app)
+    assert app.toast and "100 removed" in app.toast[0].value
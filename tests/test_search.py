@@ -0,0 +1,31 @@
+"""The "Search any column" box finds the same rows in memory and in large-dataset mode."""
+import re
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+TERMS = ["—", "nan", "<NA>", "^NO$", "1$", "mir-1\\b", "(", "(?<=1)2", "\\Ahsa", "(?s)E.\\n", "[^a-z]{30}"]
+
+
+def rows_found(monkeypatch, tmp_path, large):
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setenv("MIRRF_LARGE", "1" if large else "0")
+    monkeypatch.setenv("MIRRF_STORE_DIR", str(tmp_path))
+    monkeypatch.setenv("MIRRF_QUERY_CACHE_MB", "0")
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=600)
+    found = {}
+    for term in TERMS:
+        at.session_state["search_any"] = term
+        at.run()
+        assert not at.exception, at.exception[0].message
+        shown = next(m.value for m in at.markdown if m.value.startswith("Rows shown"))
+        found[term] = int(re.search(r"\d+", shown).group())
+    return found
+
+
+def test_large_mode_searches_the_prepared_values(monkeypatch, tmp_path):
+    in_memory = rows_found(monkeypatch, tmp_path, large=False)
+    assert in_memory["—"] > 0         # placeholder written by the table preparation, not in the CSV
+    assert rows_found(monkeypatch, tmp_path, large=True) == in_memory
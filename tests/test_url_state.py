@@ -0,0 +1,106 @@
+"""Shared links with values no widget offers must open the default view, not fail.
+
+Runs the script headlessly (Streamlit AppTest) on the bundled table.
+"""
+import re
+from pathlib import Path
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def open_link(monkeypatch, params):
+    """The app opened from a link with query parameters `params` (name -> value or list of values)."""
+    monkeypatch.chdir(ROOT)
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=600)
+    for name, value in params.items():
+        at.query_params[name] = value
+    at.run()
+    assert not at.exception, at.exception[0].message if at.exception else None
+    return at
+
+
+def rows_shown(at):
+    for md in at.markdown:
+        m = re.search(r"Rows shown: \*\*(\d+)\*\*", md.value)
+        if m:
+            return int(m.group(1))
+    raise AssertionError("no row count on the page")
+
+
+@pytest.fixture(scope="module")
+def all_rows():
+    with pytest.MonkeyPatch.context() as mp:
+        return rows_shown(open_link(mp, {}))
+
+
+def test_unknown_depth_falls_back_to_any(monkeypatch, all_rows):
+    at = open_link(monkeypatch, {"adv": "1", "depth": "bogus"})
+    assert at.selectbox(key="cons_depth").value == "Any"
+    assert rows_shown(at) == all_rows
+
+
+def test_unknown_species_is_dropped(monkeypatch):
+    at = open_link(monkeypatch, {"adv": "1", "found": ["bogus", "M. musculus"]})
+    assert at.multiselect(key="cons_species_found").value == ["M. musculus"]
+    assert at.session_state["cons_species_found"] == ["M. musculus"]
+
+
+def test_min_found_is_clamped_to_the_species(monkeypatch):
+    at = open_link(monkeypatch, {
+        "adv": "1", "found": "M. musculus", "match": "At least k of them", "min_found": "100",
+    })
+    k = at.slider(key="cons_species_k")
+    assert k.value == k.max
+
+
+def test_unknown_family_is_dropped(monkeypatch, all_rows):
+    at = open_link(monkeypatch, {"family": "bogus"})
+    assert at.multiselect(key="ms_family").value == []
+    assert rows_shown(at) == all_rows
+
+
+@pytest.mark.parametrize("params", [
+    {"conservation": "bogus"},
+    {"repeat": "bogus"},
+    {"table": "bogus"},
+    {"adv": "1", "db": "bogus", "class": "bogus"},
+    {"adv": "1", "expressed": "bogus", "not_expressed": "bogus"},
+    {"adv": "1", "seq_cols": "bogus", "seq_filter": "bogus", "sort": "bogus"},
+    {"adv": "1", "seq_filter": "gc", "seq_range": "gc:-5:500"},
+    {"expand": "bogus"},
+    {"nn": "bogus", "nn_k": "0", "nn_metric": "bogus"},
+    {"page": "-3"},
+])
+def test_malformed_link_opens_the_whole_table(monkeypatch, all_rows, params):
+    at = open_link(monkeypatch, params)
+    assert rows_shown(at) == all_rows
+
+
+@pytest.mark.parametrize("bogus", [{"match": "bogus"}, {"stability": "bogus"}, {"min_found": "0"}])
+def test_bad_species_options_fall_back_to_the_defaults(monkeypatch, bogus):
+    link = {"adv": "1", "found": "M. musculus"}
+    expected = rows_shown(open_link(monkeypatch, link))
+    at = open_link(monkeypatch, {**link, "match": "At least k of them", **bogus})
+    assert rows_shown(at) == expected
+
+
+def test_release_switch_drops_missing_levels(monkeypatch, tmp_path):
+    """A repeat class selected in one release and missing from the next is dropped before filtering."""
+    import pandas as pd
+
+    table = pd.read_csv(ROOT / "sfile2_NEW_plusFam.csv")
+    classes = table["Repeat_Class"].dropna().unique().tolist()
+    gone = classes[0]
+    (tmp_path / "releases").mkdir()
+    table[table["Repeat_Class"] != gone].to_csv(tmp_path / "releases" / "without.csv", index=False)
+    monkeypatch.setenv("MIRRF_RELEASES", str(tmp_path / "releases"))
+
+    at = open_link(monkeypatch, {"repeat": gone})
+    assert at.multiselect(key="ms_repeat").value == [gone]
+    at.selectbox(key="release").select("without").run()
+    assert not at.exception
+    assert at.multiselect(key="ms_repeat").value == []
+    assert rows_shown(at) == (table["Repeat_Class"] != gone).sum()